@@ -1,17 +1,42 @@
+import math
 import random
-import numpy as np
-from math import log
+import logging
 from environment import Agent, Environment
 from planner import RoutePlanner
-from simulator import Simulator
+from qtable import QTable
+from tripstats import TripStats
+
+log = logging.getLogger(__name__)
+
+# Both constant and time decayed versions of alpha and epsilon were tested; they are kept here as named schedules,
+# mapping the number of simulated steps to a value. LearningAgent also accepts a plain number for a constant value.
+
+alpha_schedules = {
+    'log': lambda sim_time: 0.5 / math.log(sim_time + 2),
+}
+
+epsilon_schedules = {
+    'cutoff': lambda sim_time: 0.2 if sim_time < 500 else 0.0,  # the final version: explore for the first 500 steps only
+    'log': lambda sim_time: 0.05 / math.log(sim_time + 2),
+    'hyperbolic': lambda sim_time: 0.9 / (1 + sim_time / 10),
+}
+
+
+def get_schedule(value, schedules):
+    """Return a function of sim_time for a schedule name, or for a constant number."""
+    if isinstance(value, basestring):
+        return schedules[value]
+    return lambda sim_time: value
+
 
 class LearningAgent(Agent):
     """An agent that learns to drive in the smartcab world."""
 
-    def __init__(self, env):
+    def __init__(self, env, alpha=0.5, gamma=0.05, epsilon='cutoff', event_sink=None, seed=None, replay=None, replay_batch=32, replay_every=1):
         super(LearningAgent, self).__init__(env)  # sets self.env = env, state = None, next_waypoint = None, and a default color
         self.color = 'red'  # override color
-        self.planner = RoutePlanner(self.env, self)  # simple route planner to get next_waypoint
+        self.random = random.Random(seed if seed is not None else random.getrandbits(32))  # the agent's own random stream
+        self.planner = RoutePlanner(self.env, self, seed=self.random.getrandbits(32))  # simple route planner to get next_waypoint
         # TODO: Initialize any additional variables here
 
         # Define the four possible actions for the smartcab
@@ -21,9 +46,17 @@ class LearningAgent(Agent):
         self.action3 = 'left'
         self.action4 = 'forward'
 
-        # Initialize the Q-Table with zeroes:
+        # Initialize the Q-Table with zeroes (a dense array indexed by an integer encoding of the state):
+
+        self.q_table = QTable()
+
+        # Learning parameters: alpha and epsilon are schedule names or constants (see alpha_schedules and epsilon_schedules)
+
+        self.alpha_schedule = get_schedule(alpha, alpha_schedules)
 
-        self.q_table = {}
+        self.gamma = gamma
+
+        self.epsilon_schedule = get_schedule(epsilon, epsilon_schedules)
 
         # Initialize other variables that are used for generating performance metrics
 
@@ -37,7 +70,23 @@ class LearningAgent(Agent):
 
         self.trip_counter = 1
 
-        self.deadline_data =[]
+        # trip_stats keeps running metrics over finished trips (last failed trip, failures in the last ten trips,
+        # mean and variance of deadline remaining); query it rather than keeping every trip's deadline remaining
+
+        self.trip_stats = TripStats(window=10)
+
+        # Optional events.EventSink that receives a record for every step
+
+        self.event_sink = event_sink
+
+        # Optional experience.ReplayMemory: every transition learned from is stored, and every replay_every steps
+        # a batch of replay_batch stored transitions is learned from again
+
+        self.replay = replay
+
+        self.replay_batch = replay_batch
+
+        self.replay_every = replay_every
 
     def reset(self, destination=None):
         self.planner.route_to(destination)
@@ -67,59 +116,43 @@ class LearningAgent(Agent):
 
         # TODO: Update state
 
-        self.state =(('light',inputs['light']),('left',inputs['left']),('right',inputs['right']),('oncoming',inputs['oncoming']),('next',self.next_waypoint))
+        self.state = QTable.encode(inputs, self.next_waypoint)
 
 
         # TODO: Select action according to your policy
 
-        if self.state not in self.q_table.keys():
-            self.q_table[self.state] = {self.action1:0,self.action2:0,self.action3:0,self.action4:0}
-
-        # Print out current state and old action, for visualization and troubleshooting
-
-        print "Simulated steps:", self.sim_time
+        self.q_table.visit(self.state)
 
-        print "Current state:", self.state
+        # Log current state and old action, for visualization and troubleshooting (skipped entirely unless debug logging is on)
 
-        print "Old action:", self.action_old
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug:
+            log.debug("Simulated steps: %s", self.sim_time)
+            log.debug("Current state: %s", QTable.decode(self.state))
+            log.debug("Old action: %s", self.action_old)
 
         # Implement Epsilon greedy learning
 
-        # Both constant and time decayed versions of epsilon were tested; only the final version is not commented out
-
-        if self.sim_time < 500:
-            epsilon = 0.2
-        else:
-            epsilon = 0.0
-
-#        epsilon = 0.05 / log(self.sim_time + 2)
-
-#        epsilon = 0.9 / (1 + self.sim_time / 10)
-
-#        epsilon = 0.5
+        epsilon = self.epsilon_schedule(self.sim_time)
 
         # Based on epsilon value, a random move is occasionally chosen
 
-        random_move = np.random.choice([1,0],p=[epsilon,1-epsilon])
+        random_move = self.random.random() < epsilon
 
-        if random_move == 1:
+        if random_move:
 
-            print "random move!"
-            action = random.choice([self.action1,self.action2,self.action3,self.action4])
+            if debug:
+                log.debug("random move!")
+            action = self.random.choice([self.action1,self.action2,self.action3,self.action4])
 
-        # If an epsilon random move is not chosen, a random move is possible if all Q values are identical for each action in a given state
+        # If an epsilon random move is not chosen, choose the action that maps to the highest Q value.
+        # A random move is still possible if several actions share the highest Q value (e.g. all Q values are identical)
 
         else:
-            if self.q_table[self.state][self.action1] == self.q_table[self.state][self.action2] == self.q_table[self.state][self.action3] == self.q_table[self.state][self.action4]:
-                action = random.choice(self.q_table[self.state].keys())
+            action = self.q_table.best_action(self.state, self.random)
 
-        # If the q values for each action are not identical, then choose the action that maps to the highest Q value
-
-            else:
-
-                action =  max(self.q_table[self.state].iterkeys(), key=(lambda key: self.q_table[self.state][key]))
-
-        print "New action:", action
+        if debug:
+            log.debug("New action: %s", action)
 
         # Execute action and get reward
         reward = self.env.act(self, action)
@@ -152,55 +185,48 @@ class LearningAgent(Agent):
         else:
             deadline_remaining = 1.0 * deadline / self.deadline_start
 
-        if deadline == 0:
-            self.trip_counter += 1
-            self.deadline_data.append(deadline_remaining)
-        elif reward >= 9.0:
+        trip_ended = deadline == 0 or reward >= 9.0
+        if trip_ended:
             self.trip_counter += 1
-            self.deadline_data.append(deadline_remaining)
-
-        if 0 in self.deadline_data:
-            last_failed_trip = 1 + (len(self.deadline_data) - 1) - self.deadline_data[::-1].index(0)
-        else:
-            last_failed_trip = 'NA'
-
-        failed_trips_last_ten = self.deadline_data[90:99].count(0)
-
-        print "Cumulative reward:", self.cumulative_reward
-        print "Successful trips so far:", self.successful_trips
-        print "Wrong moves so far:", self.wrong_moves
-        print "Starting deadline:", self.deadline_start
-        print "Deadline remaining:", deadline_remaining
-        print "Last failed trip:", last_failed_trip
-        print "Failed trips in last 10 trips:", failed_trips_last_ten
-
-        # Output the average deadline_remaining, which is averaged over all trips in a given simulation
-
-        print "Deadline Remaining at end of each trip:",self.deadline_data
-        if len(self.deadline_data) > 0:
-            print "Average Deadline remaining:", sum(self.deadline_data) / len(self.deadline_data)
+            self.trip_stats.add(deadline_remaining)
+
+        if debug:
+            log.debug("Cumulative reward: %s", self.cumulative_reward)
+            log.debug("Successful trips so far: %s", self.successful_trips)
+            log.debug("Wrong moves so far: %s", self.wrong_moves)
+            log.debug("Starting deadline: %s", self.deadline_start)
+            log.debug("Deadline remaining: %s", deadline_remaining)
+            log.debug("Last failed trip: %s", self.trip_stats.last_failed_trip)
+            log.debug("Failed trips in last 10 trips: %s", self.trip_stats.recent_failures())
+            log.debug("Average Deadline remaining: %s", self.trip_stats.mean)
+        if trip_ended:
+            log.info("LearningAgent.update(): trip %s ended with deadline remaining %s; successful trips = %s, wrong moves = %s, "
+                     "cumulative reward = %s, last failed trip = %s, failed trips in last 10 trips = %s, average deadline remaining = %s",
+                     self.trip_stats.count, deadline_remaining, self.successful_trips, self.wrong_moves,
+                     self.cumulative_reward, self.trip_stats.last_failed_trip, self.trip_stats.recent_failures(), self.trip_stats.mean)
 
         # TODO: Learn policy based on state, action, reward
 
-        # Both constant and time decayed versions of alpha were tested; only the final version is not commented out
-
-#        alpha = 0.5 / log(self.sim_time + 2)
+        alpha = self.alpha_schedule(self.sim_time)
+        gamma = self.gamma
 
-        alpha = 0.5
-        gamma = 0.05
+        # Log learning parameters, for visualization and troubleshooting purposes
 
-        # print learning parameters, for visualization and troubleshooting purposes
-
-        print "alpha:", alpha
-        print "gamma:", gamma
-        print "epsilon:", epsilon
+        if debug:
+            log.debug("alpha: %s", alpha)
+            log.debug("gamma: %s", gamma)
+            log.debug("epsilon: %s", epsilon)
 
         # Update the Q-table values, using the formula provided in the Reinforcement Learning lecture series
 
         if self.state_old == 'NA':
-            self.q_table[self.state][action] = alpha * reward
+            self.q_table.set(self.state, action, alpha * reward)
         else:
-            self.q_table[self.state_old][self.action_old] = (1-alpha) * self.q_table[self.state_old][self.action_old] + alpha * (self.reward_old + gamma * self.q_table[self.state][action])
+            self.q_table.set(self.state_old, self.action_old, (1-alpha) * self.q_table.get(self.state_old, self.action_old) + alpha * (self.reward_old + gamma * self.q_table.get(self.state, action)))
+            if self.replay is not None:
+                self.replay.add(self.state_old, QTable.action_index[self.action_old], self.reward_old, self.state, QTable.action_index[action])
+                if self.sim_time % self.replay_every == 0 and len(self.replay) >= self.replay_batch:
+                    self.q_table.update_batch(*self.replay.sample(self.replay_batch), alpha=alpha, gamma=gamma)
 
         # Update the 'old' state, action and reward before looping back to the next move
 
@@ -212,15 +238,21 @@ class LearningAgent(Agent):
 
         self.sim_time += 1
 
-        # print the Q-table, for visualization and troubleshooting purposes
+        if self.event_sink is not None:
+            self.event_sink.emit({'t': t, 'state': self.state, 'action': action, 'reward': reward, 'deadline': deadline})
 
-        print "Q-TABLE:",self.q_table
+        # Log the Q-table, for visualization and troubleshooting purposes
 
-        print "LearningAgent.update(): deadline = {}, inputs = {}, action = {}, reward = {}".format(deadline, inputs, action, reward)  # [debug]
+        if debug:
+            log.debug("Q-TABLE: %s", self.q_table)
+            log.debug("LearningAgent.update(): deadline = %s, inputs = %s, action = %s, reward = %s", deadline, inputs, action, reward)
 
 
 def run():
     """Run the agent for a finite number of trials."""
+    from simulator import Simulator  # not needed to import LearningAgent
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')  # use logging.DEBUG to follow every step
 
     # Set up environment and agent
     e = Environment()  # create environment (also adds some dummy traffic)
@@ -229,8 +261,8 @@ def run():
     # NOTE: You can set enforce_deadline=False while debugging to allow longer trials
 
     # Now simulate it
-    sim = Simulator(e, update_delay=0.0000001, display=False)  # create simulator (uses pygame when display=True, if available)
-    # NOTE: To speed up simulation, reduce update_delay and/or set display=False
+    sim = Simulator(e, update_delay=0.0, display=False)  # create simulator (uses pygame when display=True, if available)
+    # NOTE: To speed up simulation, reduce update_delay and/or set display=False (with both, trials run headless, without pacing)
 
     sim.run(n_trials=100)  # run for a specified number of trials
     # NOTE: To quit midway, press Esc or close pygame window, or hit Ctrl+C on the command-line
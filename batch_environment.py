@@ -0,0 +1,254 @@
+import numpy as np
+
+from dummy_traffic import sticky
+from environment import Environment, DummyAgent
+from rules import get_rules
+
+
+class BatchEnvironment(object):
+    """Many independent smartcab worlds, stepped together with NumPy arrays.
+
+    Every world follows the same rules as Environment (rules is a rules.RuleSet or a name from
+    rules.rule_sets, by default the default rules): slots 0..num_dummies-1 hold dummy agents that
+    behave like DummyAgent, and the last slot holds the primary agent, whose actions are chosen by a
+    policy passed to step(). Agents are updated in slot order (as Environment does in agent_states
+    order), and each slot is processed for all worlds in one vectorized pass.
+
+    Actions, waypoints and sensed inputs are integer codes indexing valid_actions; lights are coded
+    with light_codes (0 = 'red', 1 = 'green'); headings index valid_headings.
+    """
+
+    valid_actions = Environment.valid_actions  # [None, 'forward', 'left', 'right']
+    valid_headings = Environment.valid_headings  # ENWS
+    light_codes = ['red', 'green']
+    hard_time_limit = Environment.hard_time_limit
+
+    NONE, FORWARD, LEFT, RIGHT = range(4)
+
+    heading_dx = np.array([h[0] for h in valid_headings])
+    heading_dy = np.array([h[1] for h in valid_headings])
+
+    def __init__(self, n_worlds, num_dummies=12, grid_size=(8, 6), enforce_deadline=True, seed=None, rules=None):
+        self.n_worlds = n_worlds
+        self.num_dummies = num_dummies
+        self.n_agents = num_dummies + 1
+        self.primary = num_dummies  # slot of the primary agent
+        self.grid_size = grid_size  # (cols, rows)
+        self.bounds = (1, 1, grid_size[0], grid_size[1])
+        self.enforce_deadline = enforce_deadline
+        self.random = np.random.RandomState(seed)
+
+        # The rules' outcomes as arrays indexed by [light, oncoming, left, action, on route] codes: the heading change
+        # of a legal move (-1 when the agent stays put) and the reward; legal is indexed by the first four codes
+        self.rules = get_rules(rules)
+        self.outcome_turn = np.empty((2, 4, 4, 4, 2), dtype=int)
+        self.outcome_reward = np.empty((2, 4, 4, 4, 2))
+        for (light, oncoming, left, action, on_route), (turn, reward) in self.rules.outcomes.iteritems():
+            key = (self.light_codes.index(light), self.valid_actions.index(oncoming), self.valid_actions.index(left),
+                   self.valid_actions.index(action), int(on_route))
+            self.outcome_turn[key] = turn if turn is not None else -1
+            self.outcome_reward[key] = reward
+        self.legal = np.array([[[[self.rules.legal(light, oncoming, left, action) for action in self.valid_actions]
+                                 for left in self.valid_actions] for oncoming in self.valid_actions] for light in self.light_codes])
+
+        # Traffic lights, indexed by [world, x - 1, y - 1]
+        shape = (n_worlds, grid_size[0], grid_size[1])
+        self.light_state = self.random.randint(0, 2, size=shape).astype(bool)  # True = NS open, False = EW open
+        self.light_period = self.random.choice([3, 4, 5], size=shape)
+        self.light_last_updated = np.zeros(shape, dtype=int)
+
+        # Agents, indexed by [world, slot]
+        shape = (n_worlds, self.n_agents)
+        self.x = self.random.randint(self.bounds[0], self.bounds[2] + 1, size=shape)
+        self.y = self.random.randint(self.bounds[1], self.bounds[3] + 1, size=shape)
+        self.heading = np.empty(shape, dtype=int)
+        self.heading.fill(self.valid_headings.index((0, 1)))  # as set by Environment.create_agent()
+        self.waypoint = self.random.randint(self.FORWARD, self.RIGHT + 1, size=shape)  # as drawn by DummyAgent()
+        self.waypoint[:, self.primary] = self.NONE
+
+        # Per-world trial state
+        self.destination = np.zeros((n_worlds, 2), dtype=int)
+        self.deadline = np.zeros(n_worlds, dtype=int)
+        self.t = np.zeros(n_worlds, dtype=int)
+        self.done = np.zeros(n_worlds, dtype=bool)
+
+    def reset(self, worlds=None):
+        """Start a new trial in the given worlds (boolean mask or index array; default: all)."""
+        mask = np.zeros(self.n_worlds, dtype=bool)
+        mask[worlds if worlds is not None else slice(None)] = True
+        n = np.count_nonzero(mask)
+        if n == 0:
+            return
+
+        self.done[mask] = False
+        self.t[mask] = 0
+        self.light_last_updated[mask] = 0
+
+        # Pick a start and a destination, redrawing pairs that are too close (as Environment.reset() does)
+        start = self._random_locations(n)
+        destination = self._random_locations(n)
+        too_close = np.abs(destination - start).sum(axis=1) < 4
+        while too_close.any():
+            k = np.count_nonzero(too_close)
+            start[too_close] = self._random_locations(k)
+            destination[too_close] = self._random_locations(k)
+            too_close = np.abs(destination - start).sum(axis=1) < 4
+
+        self.destination[mask] = destination
+        self.deadline[mask] = np.abs(destination - start).sum(axis=1) * 5
+
+        # Initialize agents: dummies are scattered at random, the primary agent starts at start
+        dummies = self._random_locations(n * self.num_dummies).reshape(n, self.num_dummies, 2)
+        self.x[mask, :self.primary] = dummies[:, :, 0]
+        self.y[mask, :self.primary] = dummies[:, :, 1]
+        self.x[mask, self.primary] = start[:, 0]
+        self.y[mask, self.primary] = start[:, 1]
+        self.heading[mask] = self.random.randint(0, 4, size=(n, self.n_agents))
+
+    def step(self, policy=None):
+        """Advance every world that is not done by one time step; return the primary agents' rewards.
+
+        policy(inputs, waypoint, deadline) receives arrays over all worlds (inputs is a dict with
+        'light', 'oncoming', 'left' and 'right' codes) and returns an array of action codes; entries
+        for worlds that are done are ignored. Without a policy the primary agent stays put, like the
+        base Agent.
+        """
+        active = ~self.done
+        rewards = np.zeros(self.n_worlds)
+        if not active.any():
+            return rewards
+
+        # Update traffic lights
+        toggle = active[:, None, None] & (self.t[:, None, None] - self.light_last_updated >= self.light_period)
+        self.light_state ^= toggle
+        self.light_last_updated[toggle] = np.broadcast_to(self.t[:, None, None], toggle.shape)[toggle]
+
+        # Update agents, one slot at a time (later slots see the moves of earlier ones)
+        for slot in xrange(self.n_agents):
+            inputs = self.sense(slot)
+            if slot == self.primary:
+                self.waypoint[active, slot] = self.next_waypoint(slot)[active]
+                if policy is not None:
+                    action = np.asarray(policy(inputs, self.waypoint[:, slot].copy(), self.deadline.copy()), dtype=int)
+                else:
+                    action = np.zeros(self.n_worlds, dtype=int)
+                action = np.where(active, action, self.NONE)
+            else:
+                action = self._dummy_action(slot, inputs, active)
+            reward = self.act(slot, action, inputs, active)
+            if slot == self.primary:
+                rewards[active] = reward[active]
+
+        # Deadline bookkeeping, for worlds whose primary agent did not reach its destination
+        running = active & ~self.done
+        self.done |= running & (self.deadline <= self.hard_time_limit)
+        if self.enforce_deadline:
+            self.done |= running & (self.deadline <= 0)
+        self.deadline[running] -= 1
+        self.t[running] += 1
+        return rewards
+
+    def sense(self, slot):
+        """Return the sensed input codes of the agent in the given slot, for every world."""
+        x = self.x[:, slot]
+        y = self.y[:, slot]
+        heading = self.heading[:, slot]
+        worlds = np.arange(self.n_worlds)
+        ns_open = self.light_state[worlds, x - 1, y - 1]
+        light = (ns_open == (heading % 2 == 1)).astype(int)  # headings 1 and 3 are N and S
+
+        # Other agents at the same intersection, classified by their heading relative to ours
+        same = (self.x == x[:, None]) & (self.y == y[:, None])
+        same[:, slot] = False
+        h = heading[:, None]
+        oncoming = self._resolve(same & (self.heading == (h + 2) % 4), sticky(self.waypoint, 'oncoming'))
+        right = self._resolve(same & (self.heading == (h + 1) % 4), sticky(self.waypoint, 'right'))
+        left = self._resolve(same & (self.heading == (h + 3) % 4), sticky(self.waypoint, 'left'))
+        return {'light': light, 'oncoming': oncoming, 'left': left, 'right': right}
+
+    def act(self, slot, action, inputs, active):
+        """Apply action codes for the agent in the given slot in active worlds; return the rewards."""
+        on_route = (action != self.NONE) & (action == self.waypoint[:, slot])
+        key = (inputs['light'], inputs['oncoming'], inputs['left'], action, on_route.astype(int))
+        turn = self.outcome_turn[key]
+        new_heading = (self.heading[:, slot] + turn) % 4
+        moved = active & (turn >= 0)
+
+        # Move agents (wrap-around)
+        cols, rows = self.grid_size
+        self.heading[moved, slot] = new_heading[moved]
+        self.x[moved, slot] = (self.x[moved, slot] + self.heading_dx[new_heading[moved]] - self.bounds[0]) % cols + self.bounds[0]
+        self.y[moved, slot] = (self.y[moved, slot] + self.heading_dy[new_heading[moved]] - self.bounds[1]) % rows + self.bounds[1]
+
+        reward = self.outcome_reward[key]
+
+        if slot == self.primary:
+            arrived = active & (self.x[:, slot] == self.destination[:, 0]) & (self.y[:, slot] == self.destination[:, 1])
+            reward += np.where(arrived & (self.deadline >= 0), self.rules.arrival_bonus, 0)
+            self.done |= arrived
+        return reward
+
+    def next_waypoint(self, slot):
+        """Vectorized RoutePlanner.next_waypoint() for the agent in the given slot."""
+        dx = self.destination[:, 0] - self.x[:, slot]
+        dy = self.destination[:, 1] - self.y[:, slot]
+        hx = self.heading_dx[self.heading[:, slot]]
+        hy = self.heading_dy[self.heading[:, slot]]
+        ew = np.select([dx * hx > 0, dx * hx < 0, dx * hy > 0], [self.FORWARD, self.RIGHT, self.LEFT], default=self.RIGHT)
+        ns = np.select([dy * hy > 0, dy * hy < 0, dy * hx > 0], [self.FORWARD, self.RIGHT, self.RIGHT], default=self.LEFT)
+        return np.select([dx != 0, dy != 0], [ew, ns], default=self.NONE)
+
+    def load_environment(self, world, env):
+        """Copy the current state of a scalar Environment into one world (useful for parity checks).
+
+        The environment must have been reset, must have num_dummies DummyAgents and its primary agent
+        must come last in agent_states.
+        """
+        agents = list(env.agent_states.iterkeys())
+        assert len(agents) == self.n_agents and agents[-1] is env.primary_agent, "Incompatible environment!"
+        assert all(isinstance(agent, DummyAgent) for agent in agents[:-1]), "Incompatible environment!"
+        assert env.grid_size == self.grid_size, "Incompatible environment!"
+        assert env.rules.settings() == self.rules.settings(), "Incompatible environment!"
+
+        for cell, (x, y) in enumerate(env.locations):
+            period = env.lights[cell].period
+            self.light_state[world, x - 1, y - 1] = env.light_state(cell)
+            self.light_period[world, x - 1, y - 1] = period
+            self.light_last_updated[world, x - 1, y - 1] = env.light_time - env.light_time % period  # last switch
+
+        for slot, agent in enumerate(agents):
+            state = env.agent_states[agent]
+            self.x[world, slot], self.y[world, slot] = state['location']
+            self.heading[world, slot] = self.valid_headings.index(state['heading'])
+            self.waypoint[world, slot] = self.valid_actions.index(agent.get_next_waypoint())
+
+        primary_state = env.agent_states[env.primary_agent]
+        self.destination[world] = primary_state['destination']
+        self.deadline[world] = primary_state['deadline']
+        self.t[world] = env.t
+        self.done[world] = env.done
+
+    def _random_locations(self, n):
+        return np.column_stack((self.random.randint(self.bounds[0], self.bounds[2] + 1, size=n),
+                                self.random.randint(self.bounds[1], self.bounds[3] + 1, size=n)))
+
+    def _dummy_action(self, slot, inputs, active):
+        """DummyAgent.update(): follow the waypoint when traffic rules allow it, then draw a new one."""
+        waypoint = self.waypoint[:, slot]
+        okay = active & self.legal[inputs['light'], inputs['oncoming'], inputs['left'], waypoint]
+        action = np.where(okay, waypoint, self.NONE)
+        self.waypoint[okay, slot] = self.random.randint(self.FORWARD, self.RIGHT + 1, size=np.count_nonzero(okay))
+        return action
+
+    def _resolve(self, mask, sticky):
+        """Per world, the input that the agents in mask (over slots) produce for one relation, sticky being the mask of
+        waypoints that stick for it: the waypoint of the first masked agent with a sticky one, else of the last."""
+        return np.where((mask & sticky).any(axis=1), self._pick(mask & sticky, first=True), self._pick(mask, first=False))
+
+    def _pick(self, mask, first):
+        """Waypoint code of the first (or last) agent in each row of mask, NONE where the row is empty."""
+        if first:
+            index = mask.argmax(axis=1)
+        else:
+            index = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+        return np.where(mask.any(axis=1), self.waypoint[np.arange(mask.shape[0]), index], self.NONE)
@@ -0,0 +1 @@
+"""Benchmarks for the smartcab simulation; run them from the repository root, e.g. `python -m benchmarks.sense`."""
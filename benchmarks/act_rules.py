@@ -0,0 +1,111 @@
+"""Cost per call of the table-driven Environment.act() against the if/elif rules it replaced.
+
+LegacyEnvironment keeps the original act() (branching on strings, and sensing the intersection a
+second time). That the compiled rules give the same outcomes is checked by test_rules.py.
+"""
+
+import time
+import random
+import bisect
+import logging
+import argparse
+
+from agent import LearningAgent
+from environment import Environment
+
+
+class LegacyEnvironment(Environment):
+
+    def act(self, agent, action):
+        assert agent in self.agent_states, "Unknown agent!"
+        assert action in self.valid_actions, "Invalid action!"
+
+        agents = self.agents
+        i = self.agent_states[agent].index
+        x, y, heading = agents.x[i], agents.y[i], agents.heading[i]
+        light = 'green' if self.light_state(self.cell(x, y)) == (heading % 2 == 1) else 'red'
+        inputs = self.sense(agent)
+
+        # Move agent if within bounds and obeys traffic rules
+        reward = 0  # reward/penalty
+        move_okay = True
+        if action == 'forward':
+            if light != 'green':
+                move_okay = False
+        elif action == 'left':
+            if light == 'green' and (inputs['oncoming'] == None or inputs['oncoming'] == 'left'):
+                heading = (heading + 1) % 4
+            else:
+                move_okay = False
+        elif action == 'right':
+            if light == 'green' or inputs['left'] != 'forward':
+                heading = (heading + 3) % 4
+            else:
+                move_okay = False
+
+        if move_okay:
+            # Valid move (could be null)
+            if action is not None:
+                # Valid non-null move
+                dx, dy = self.valid_headings[heading]
+                new_x = (x + dx - self.bounds[0]) % (self.bounds[2] - self.bounds[0] + 1) + self.bounds[0]
+                new_y = (y + dy - self.bounds[1]) % (self.bounds[3] - self.bounds[1] + 1) + self.bounds[1]  # wrap-around
+                self.occupancy[self.cell(x, y)].remove(i)
+                bisect.insort(self.occupancy.setdefault(self.cell(new_x, new_y), []), i)
+                agents.x[i] = new_x
+                agents.y[i] = new_y
+                agents.heading[i] = heading
+                reward = 2.0 if action == agent.get_next_waypoint() else -0.5  # valid, but is it correct? (as per waypoint)
+            else:
+                # Valid null move
+                reward = 0.0
+        else:
+            # Invalid move
+            reward = -1.0
+
+        if agent is self.primary_agent:
+            if agents.x[i] == agents.dest_x[i] and agents.y[i] == agents.dest_y[i]:
+                if agents.deadline[i] >= 0:
+                    reward += 10  # bonus
+                self.done = True
+            self.status = (agent.get_state(), action, reward)
+            for observer in self.observers:
+                observer.primary_acted(self, action, reward)
+
+        return reward
+
+
+def make_env(env_class, seed, num_dummies):
+    env = env_class(num_dummies=num_dummies, seed=seed)
+    env.set_primary_agent(env.create_agent(LearningAgent, seed=seed), enforce_deadline=True)
+    return env
+
+
+def time_act(env_class, seed, num_dummies, calls):
+    """Microseconds per act() call by the dummies of a fresh environment, with random actions."""
+    random.seed(seed)
+    env = make_env(env_class, seed, num_dummies)
+    env.reset()
+    agents = [agent for agent in env.agent_states if agent is not env.primary_agent]
+    actions = [random.choice(Environment.valid_actions) for _ in xrange(1000)]
+    start_time = time.time()
+    for i in xrange(calls):
+        env.act(agents[i % len(agents)], actions[i % len(actions)])
+    return (time.time() - start_time) * 1e6 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dummies', type=int, nargs='+', default=[12, 100])
+    parser.add_argument('--calls', type=int, default=50000, help="act() calls timed per configuration")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print "{:>8}  {:>14}  {:>14}".format("dummies", "legacy us/act", "table us/act")
+    for num_dummies in args.dummies:
+        print "{:>8}  {:>14.2f}  {:>14.2f}".format(num_dummies, time_act(LegacyEnvironment, 0, num_dummies, args.calls),
+                                                   time_act(Environment, 0, num_dummies, args.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Simulated steps saved by stopping training early with convergence monitors, and what stopping costs.
+
+For each monitor, trains under several seeds with a budget of --trials trials and stops when the
+monitor reports convergence. The agent then runs the trials it skipped (the same ones a full run
+would have had, since every trial's seed is fixed). That measures the steps actually saved, against
+Simulator's estimate, and the trips that still failed after the stop, i.e. what stopping early gave
+up.
+"""
+
+import logging
+import argparse
+
+from agent import LearningAgent
+from convergence import AllOf, NoRecentFailures, QTableDelta
+from environment import Environment
+from simulator import Simulator
+
+
+def stop_early(seed, n_trials, monitor):
+    """Return (trials run, steps run, estimated steps saved, actual steps saved, failed trips after stopping)."""
+    env = Environment(seed=seed)
+    agent = env.create_agent(LearningAgent, seed=seed)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    sim = Simulator(env, update_delay=0.0, display=False)
+    sim.run(n_trials=n_trials, monitor=monitor)
+    trials_run, steps_run, steps_saved = sim.trials_run, sim.steps_run, sim.steps_saved
+    failures = agent.trip_stats.failures
+    sim.run(n_trials=n_trials - trials_run)  # the trials skipped
+    return trials_run, steps_run, steps_saved, sim.steps_run, agent.trip_stats.failures - failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seeds', type=int, default=10)
+    parser.add_argument('--trials', type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    monitors = [
+        ('none', lambda: None),
+        ('no failures in 10', lambda: NoRecentFailures(10)),
+        ('no failures in 20', lambda: NoRecentFailures(20)),
+        ('Q change < 0.002', lambda: QTableDelta(0.002, 10)),
+        ('both', lambda: AllOf(NoRecentFailures(10), QTableDelta(0.002, 10))),
+    ]
+    print "{:<20}  {:>10}  {:>10}  {:>15}  {:>12}  {:>15}".format(
+        "monitor", "trials run", "steps run", "est. steps saved", "steps saved", "failures after")
+    for name, make_monitor in monitors:
+        results = [stop_early(seed, args.trials, make_monitor()) for seed in xrange(args.seeds)]
+        print "{:<20}  {:>10.1f}  {:>10.1f}  {:>15.1f}  {:>12.1f}  {:>15.1f}".format(
+            name, *[sum(column) / float(len(results)) for column in zip(*results)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Simulated steps LearningAgent needs to learn, with and without experience replay.
+
+For each configuration, trains under several seeds and reports the mean number of steps until the
+last ten trips all succeeded, and the mean number of successful trips.
+"""
+
+import logging
+import argparse
+
+from agent import LearningAgent
+from environment import Environment
+from experience import ReplayMemory
+from simulator import Simulator
+
+
+def steps_to_learn(seed, n_trials, replay=None):
+    env = Environment(seed=seed)
+    agent = env.create_agent(LearningAgent, seed=seed, replay=replay)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    sim = Simulator(env, update_delay=0.0, display=False)
+    converged_after = None
+    for _ in xrange(n_trials):
+        sim.run(n_trials=1)
+        if converged_after is None and agent.trip_stats.count >= 10 and agent.trip_stats.recent_failures() == 0:
+            converged_after = agent.sim_time
+    return converged_after, agent.successful_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seeds', type=int, default=10)
+    parser.add_argument('--trials', type=int, default=100)
+    parser.add_argument('--capacity', type=int, default=200)
+    parser.add_argument('--recent', type=int, default=50, help="window of the 'recent' sampling policy")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    configs = [('no replay', lambda seed: None)] + [
+        ('{} / {}'.format(eviction, sampling), lambda seed, eviction=eviction, sampling=sampling: ReplayMemory(args.capacity, eviction, sampling, recent=args.recent, seed=seed))
+        for eviction in ['fifo', 'reservoir'] for sampling in ['uniform', 'recent']]
+    print "{:<22}  {:>14}  {:>10}  {:>12}".format("replay", "steps to learn", "converged", "successful")
+    for name, make_replay in configs:
+        results = [steps_to_learn(seed, args.trials, make_replay(seed)) for seed in xrange(args.seeds)]
+        converged = [steps for steps, _ in results if steps is not None]
+        print "{:<22}  {:>14.1f}  {:>10}  {:>12.1f}".format(
+            name, sum(converged) / float(len(converged)) if converged else float('nan'), "{}/{}".format(len(converged), len(results)),
+            sum(successful for _, successful in results) / float(len(results)))
+
+
+if __name__ == '__main__':
+    main()
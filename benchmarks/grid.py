@@ -0,0 +1,48 @@
+"""Cost of building and resetting Environment as the grid grows, up to 1000x1000 intersections."""
+
+import time
+import random
+import logging
+import resource
+import argparse
+
+from environment import Environment
+
+
+def grid_size(text):
+    cols, rows = text.lower().split('x')
+    return int(cols), int(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--grids', type=grid_size, nargs='+', default=[(8, 6), (100, 100), (300, 300), (1000, 1000)], help="grid sizes as COLSxROWS")
+    parser.add_argument('--resets', type=int, default=100, help="resets timed per grid")
+    parser.add_argument('--steps', type=int, default=10, help="steps timed per grid")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(0)
+    print "{:>11}  {:>13}  {:>10}  {:>10}  {:>10}  {:>12}".format("grid", "intersections", "build s", "reset us", "step ms", "peak RSS MB")
+    for size in args.grids:
+        start_time = time.time()
+        env = Environment(grid_size=size)
+        build = time.time() - start_time
+
+        start_time = time.time()
+        for _ in xrange(args.resets):
+            env.reset()
+        reset = (time.time() - start_time) / args.resets
+
+        start_time = time.time()
+        for _ in xrange(args.steps):
+            env.step()
+        step = (time.time() - start_time) / args.steps
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        print "{:>11}  {:>13}  {:>10.3f}  {:>10.1f}  {:>10.3f}  {:>12.1f}".format("{}x{}".format(*size), len(env.locations), build, reset * 1e6, step * 1e3, peak)
+        del env
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Convergence of shared-table training against the number of worker processes.
+
+For each worker count, trains from scratch under several seeds and reports the mean number of trips
+(over all workers) until the last ten trips all succeeded, the mean wall time to get there, and the
+trip throughput. Trips are the unit of experience, so with enough cores the wall time should fall
+as workers are added while the trips needed stay about the same.
+"""
+
+import argparse
+import multiprocessing
+
+from parallel_train import train
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seeds', type=int, default=5, help="training runs per worker count")
+    parser.add_argument('--max-trips', type=int, default=1000)
+    args = parser.parse_args()
+
+    print "{} CPUs".format(multiprocessing.cpu_count())
+    print "{:>8}  {:>12}  {:>12}  {:>10}  {:>10}".format("workers", "trips", "converged", "seconds", "trips/sec")
+    for n_workers in args.workers:
+        results = [train(n_workers, seed=seed, max_trips=args.max_trips)[1] for seed in xrange(args.seeds)]
+        converged = [result['converged_after'] for result in results if result['converged_after'] is not None]
+        trips = sum(result['trips'] for result in results)
+        seconds = sum(result['elapsed'] for result in results)
+        print "{:>8}  {:>12.1f}  {:>12}  {:>10.3f}  {:>10.1f}".format(
+            n_workers, sum(converged) / float(len(converged)) if converged else float('nan'),
+            "{}/{}".format(len(converged), len(results)), seconds / len(results), trips / seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Latency of Policy for batches of action queries, directly and through the JSON-lines front end."""
+
+import json
+import time
+import argparse
+import StringIO
+
+import numpy as np
+
+from policy import Policy, serve_lines
+from qtable import QTable
+
+
+def time_call(function, repeat):
+    start_time = time.time()
+    for _ in xrange(repeat):
+        function()
+    return (time.time() - start_time) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=50, help="calls timed per batch size")
+    args = parser.parse_args()
+
+    random = np.random.RandomState(0)
+    values = random.randint(-2, 3, size=(QTable.n_states, QTable.n_actions)).astype(float)  # plenty of ties
+    policy = Policy(values, seed=0)
+
+    print "{:>8}  {:>14}  {:>14}  {:>14}".format("batch", "states us/call", "json us/call", "json us/query")
+    for batch_size in args.batch_sizes:
+        states = random.randint(0, QTable.n_states, size=batch_size)
+        queries = [{name: value for name, value in QTable.decode(state)} for state in states]
+        line = json.dumps(queries) + '\n'
+
+        direct = time_call(lambda: policy.act_states(states), args.repeat)
+        front_end = time_call(lambda: serve_lines(policy, StringIO.StringIO(line), StringIO.StringIO()), args.repeat)
+        print "{:>8}  {:>14.1f}  {:>14.1f}  {:>14.2f}".format(batch_size, direct * 1e6, front_end * 1e6, front_end * 1e6 / batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Frame cost of Simulator's renderer: incremental (dirty rectangles) against a full redraw every frame.
+
+Runs headless on SDL's dummy video driver, so it times drawing only; the pixels sent to the display
+per frame stand in for the flip cost a real display would add.
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+
+from environment import Environment
+from simulator import Simulator
+from benchmarks.grid import grid_size
+
+
+def time_frames(size, num_dummies, steps, full):
+    """Return (ms per frame, pixels updated per frame) over steps rendered steps."""
+    random.seed(0)
+    env = Environment(num_dummies=num_dummies, grid_size=size)
+    sim = Simulator(env, update_delay=0.0, display=True)
+    if not sim.display:
+        raise SystemExit("pygame is needed for this benchmark")
+    renderer = sim.renderer
+    env.reset()
+    sim.render()  # the first frame is always drawn in full
+    renderer.pixels_updated = 0
+    start_time = time.time()
+    for _ in xrange(steps):
+        env.step()
+        if full:
+            renderer.invalidate()
+        sim.render()
+    return (time.time() - start_time) * 1e3 / steps, renderer.pixels_updated / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--grids', type=grid_size, nargs='+', default=[(8, 6), (20, 15), (40, 30)], help="grid sizes as COLSxROWS")
+    parser.add_argument('--dummies', type=int, default=12)
+    parser.add_argument('--steps', type=int, default=100, help="frames timed per grid")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    logging.basicConfig(level=logging.WARNING)
+    print "{:>9}  {:>14}  {:>14}  {:>16}  {:>16}".format("grid", "full ms/frame", "incr ms/frame", "full px/frame", "incr px/frame")
+    for size in args.grids:
+        full_ms, full_pixels = time_frames(size, args.dummies, args.steps, True)
+        incremental_ms, incremental_pixels = time_frames(size, args.dummies, args.steps, False)
+        print "{:>9}  {:>14.2f}  {:>14.2f}  {:>16}  {:>16}".format(
+            "{}x{}".format(*size), full_ms, incremental_ms, full_pixels, incremental_pixels)
+
+
+if __name__ == '__main__':
+    main()
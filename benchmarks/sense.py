@@ -0,0 +1,39 @@
+"""Per-step cost of Environment.step() as the number of agents grows.
+
+Every DummyAgent senses once and acts once per step, so this mostly measures Environment.sense().
+"""
+
+import time
+import random
+import logging
+import argparse
+
+from environment import Environment
+
+
+def time_steps(num_dummies, n_steps, seed=0):
+    """Return the mean seconds per Environment.step() with the given number of dummy agents."""
+    random.seed(seed)
+    env = Environment(num_dummies=num_dummies)
+    env.reset()
+    start_time = time.time()
+    for _ in xrange(n_steps):
+        env.step()
+    return (time.time() - start_time) / n_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--agents', type=int, nargs='+', default=[12, 100, 1000, 10000], help="numbers of dummy agents")
+    parser.add_argument('--steps', type=int, default=20, help="steps timed per agent count")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print "{:>8}  {:>12}  {:>14}".format("agents", "ms/step", "us/agent-step")
+    for num_dummies in args.agents:
+        seconds = time_steps(num_dummies, args.steps)
+        print "{:>8}  {:>12.3f}  {:>14.2f}".format(num_dummies, seconds * 1e3, seconds * 1e6 / num_dummies)
+
+
+if __name__ == '__main__':
+    main()
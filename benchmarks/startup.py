@@ -0,0 +1,57 @@
+"""Process startup cost: interpreter start, imports and setup of the simulation core, each in a fresh process.
+
+Each scenario runs in its own `python -c` process (as a short-lived sweep worker would), which reports
+the time its imports and setup took and whether NumPy got loaded; the wall time of the whole process
+is measured from outside.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+scenarios = [
+    ('interpreter', "pass"),
+    ('environment', "from environment import Environment\nEnvironment()"),
+    ('headless simulator', "from environment import Environment\nfrom simulator import Simulator\n"
+                           "Simulator(Environment(), update_delay=0.0, display=False)"),
+    ('learning agent', "from environment import Environment\nfrom agent import LearningAgent\n"
+                       "env = Environment()\nenv.set_primary_agent(env.create_agent(LearningAgent))"),
+    ('vectorized dummies', "from environment import Environment\nEnvironment(num_dummies=1000, vectorized_dummies=True)"),
+]
+
+script = """import time
+start_time = time.time()
+{}
+import sys, json
+print json.dumps({{'seconds': time.time() - start_time, 'modules': len(sys.modules), 'numpy': 'numpy' in sys.modules}})
+"""
+
+
+def time_startup(code, runs):
+    """Return (mean process wall seconds, mean import and setup seconds, modules loaded, NumPy loaded)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    wall = setup = 0.0
+    for _ in xrange(runs):
+        start_time = time.time()
+        result = json.loads(subprocess.check_output([sys.executable, '-c', script.format(code)], cwd=root))
+        wall += time.time() - start_time
+        setup += result['seconds']
+    return wall / runs, setup / runs, result['modules'], result['numpy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=20, help="processes started per scenario")
+    args = parser.parse_args()
+
+    print "{:<20}  {:>10}  {:>14}  {:>8}  {:>6}".format("scenario", "process ms", "import+setup ms", "modules", "numpy")
+    for name, code in scenarios:
+        wall, setup, modules, numpy = time_startup(code, args.runs)
+        print "{:<20}  {:>10.1f}  {:>14.1f}  {:>8}  {:>6}".format(name, wall * 1e3, setup * 1e3, modules, "yes" if numpy else "no")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Benchmark suite for the simulation core, with regression tracking against a saved baseline.
+
+Each case runs in a fresh process under a fixed seed and reports calls, microseconds per call, calls
+(steps) per second and the peak resident memory of its process. With --repeat, each case is run
+several times and the fastest run is kept, to damp timing noise.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare baseline.json   # exits with status 1 on a regression
+    python -m benchmarks.suite --grid 16 12 --output results-16x12.json
+
+Cases are only compared against a baseline run on the same grid.
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+import resource
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from agent import LearningAgent
+from environment import Environment
+from simulator import Simulator
+
+
+def make_env(config):
+    random.seed(config['seed'])
+    np.random.seed(config['seed'])
+    env = Environment(num_dummies=config['num_dummies'], grid_size=tuple(config['grid_size']))
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    env.reset()
+    return env, agent
+
+
+def bench_env_step(config):
+    env, _ = make_env(config)
+    start_time = time.time()
+    for _ in xrange(config['calls']):
+        if env.done:
+            env.reset()
+        env.step()
+    return config['calls'], time.time() - start_time
+
+
+def bench_env_sense(config):
+    env, _ = make_env(config)
+    agents = list(env.agent_states)
+    start_time = time.time()
+    for i in xrange(config['calls']):
+        env.sense(agents[i % len(agents)])
+    return config['calls'], time.time() - start_time
+
+
+def bench_env_act(config):
+    env, _ = make_env(config)
+    agents = [agent for agent in env.agent_states if agent is not env.primary_agent]  # the primary agent would end the trial
+    actions = [random.choice(Environment.valid_actions) for _ in xrange(1000)]
+    start_time = time.time()
+    for i in xrange(config['calls']):
+        env.act(agents[i % len(agents)], actions[i % len(actions)])
+    return config['calls'], time.time() - start_time
+
+
+def bench_planner_next_waypoint(config):
+    env, agent = make_env(config)
+    start_time = time.time()
+    for _ in xrange(config['calls']):
+        agent.planner.next_waypoint()
+    return config['calls'], time.time() - start_time
+
+
+def bench_agent_update(config):
+    env, agent = make_env(config)
+    start_time = time.time()
+    for t in xrange(config['calls']):
+        if env.done:
+            env.reset()
+        agent.update(t)
+    return config['calls'], time.time() - start_time
+
+
+def bench_simulator_run(config):
+    env, _ = make_env(config)
+    sim = Simulator(env, update_delay=0.0, display=False)
+    start_time = time.time()
+    sim.run(n_trials=config['n_trials'])
+    return sum(trial['steps'] for trial in sim.trial_stats), time.time() - start_time
+
+
+cases = [
+    ('env_step', bench_env_step),
+    ('env_sense', bench_env_sense),
+    ('env_act', bench_env_act),
+    ('planner_next_waypoint', bench_planner_next_waypoint),
+    ('agent_update', bench_agent_update),
+    ('simulator_run', bench_simulator_run),
+]
+
+
+def run_case(args):
+    """Run one case (in a worker process) and return its measurements."""
+    name, config = args
+    logging.disable(logging.INFO)
+    calls, seconds = dict(cases)[name](config)
+    return {'calls': calls, 'seconds': seconds, 'us_per_call': seconds * 1e6 / calls, 'calls_per_sec': calls / seconds,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_suite(config, names=None, repeat=1):
+    names = names or [name for name, _ in cases]
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)  # a fresh process per case, so peak memory is per case
+    try:
+        runs = pool.map(run_case, [(name, config) for name in names for _ in xrange(repeat)], chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    results = {}
+    for i, name in enumerate(names):
+        results[name] = min(runs[i * repeat:(i + 1) * repeat], key=lambda result: result['us_per_call'])
+    return {'config': config, 'results': results}
+
+
+def comparison_key(run, name):
+    """Key matching a case between runs: its name and the grid it ran on."""
+    return name, tuple(run['config']['grid_size'])
+
+
+def compare(current, baseline, threshold):
+    """Return (name, baseline us/call, current us/call, ratio, regressed) for cases present in both runs."""
+    baseline_results = {comparison_key(baseline, name): result for name, result in baseline['results'].iteritems()}
+    rows = []
+    for name, result in sorted(current['results'].iteritems()):
+        key = comparison_key(current, name)
+        if key not in baseline_results:
+            continue
+        before = baseline_results[key]['us_per_call']
+        ratio = result['us_per_call'] / before
+        rows.append((name, before, result['us_per_call'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=[name for name, _ in cases], help="cases to run (default: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--num-dummies', type=int, default=12)
+    parser.add_argument('--grid', type=int, nargs=2, metavar=('W', 'H'), default=list(Environment(num_dummies=0).grid_size),
+                        help="grid size of the environments")
+    parser.add_argument('--calls', type=int, default=20000, help="calls per micro-benchmark")
+    parser.add_argument('--trials', type=int, default=100, help="trials for simulator_run")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case; the fastest is kept")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="baseline JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="slowdown (fraction of us/call) flagged as a regression")
+    args = parser.parse_args()
+
+    config = {'seed': args.seed, 'num_dummies': args.num_dummies, 'calls': args.calls, 'n_trials': args.trials,
+              'grid_size': args.grid}
+    current = run_suite(config, args.cases, args.repeat)
+
+    print "{:<24}  {:>10}  {:>12}  {:>14}  {:>12}".format("case", "calls", "us/call", "calls/sec", "peak RSS kB")
+    for name, result in sorted(current['results'].iteritems()):
+        print "{:<24}  {:>10}  {:>12.2f}  {:>14.1f}  {:>12}".format(name, result['calls'], result['us_per_call'], result['calls_per_sec'], result['peak_rss_kb'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['config'] != config:
+            print "\nWarning: baseline was run with a different configuration: {}".format(baseline['config'])
+        rows = compare(current, baseline, args.threshold)
+        if rows:
+            print "\n{:<24}  {:>12}  {:>12}  {:>8}".format("case", "baseline us", "current us", "ratio")
+        else:
+            print "\nNo cases to compare: the baseline ran other cases or on another grid"
+        regressions = 0
+        for name, before, after, ratio, regressed in rows:
+            print "{:<24}  {:>12.2f}  {:>12.2f}  {:>8.2f}{}".format(name, before, after, ratio, "  REGRESSION" if regressed else "")
+            regressions += regressed
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Step rate of Environment with many dummy agents, as DummyAgents and as a vectorized DummyTraffic engine."""
+
+import time
+import random
+import logging
+import argparse
+
+from environment import Environment
+from benchmarks.grid import grid_size
+
+
+def steps_per_sec(num_dummies, size, vectorized, steps):
+    random.seed(0)
+    env = Environment(num_dummies=num_dummies, grid_size=size, vectorized_dummies=vectorized)
+    env.reset()
+    start_time = time.time()
+    for _ in xrange(steps):
+        env.step()
+    return steps / (time.time() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dummies', type=int, nargs='+', default=[12, 100, 1000, 10000, 50000])
+    parser.add_argument('--grid', type=grid_size, default=(100, 100), help="grid size as COLSxROWS")
+    parser.add_argument('--steps', type=int, default=50, help="steps timed per configuration")
+    parser.add_argument('--scalar-limit', type=int, default=10000, help="skip DummyAgents beyond this many dummies")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print "{:>8}  {:>16}  {:>16}".format("dummies", "DummyAgent st/s", "vectorized st/s")
+    for n in args.dummies:
+        scalar = "{:.1f}".format(steps_per_sec(n, args.grid, False, args.steps)) if n <= args.scalar_limit else "-"
+        print "{:>8}  {:>16}  {:>16.1f}".format(n, scalar, steps_per_sec(n, args.grid, True, args.steps))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Save and load a LearningAgent's Q-table and counters in a compact binary file.
+
+Layout (little-endian): a fixed header with the table shape, the agent's counters and its trip_stats
+(TripStats), one byte per trip in the trip_stats window (1 if it failed), one byte per state for
+QTable.visited, then the float64 Q values starting at an 8-byte aligned offset. Since the
+values are stored raw, load(path, mmap=True) maps them read-only, so many worker processes can
+share one policy through the page cache instead of each holding a copy.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+from qtable import QTable
+from tripstats import TripStats
+
+MAGIC = 'SCQT'
+VERSION = 2
+# magic, version, padding, n_states, n_actions, counters, then trip_stats: window, trips in the window, count,
+# failures, last_failed_trip (0 for none), mean, _m2
+header = struct.Struct('<4sHHIIqqqqdIIqqqdd')
+counters = ['sim_time', 'successful_trips', 'wrong_moves', 'trip_counter', 'cumulative_reward']
+
+
+def _visited_offset(window):
+    return header.size + window
+
+
+def _values_offset(n_states, window):
+    return (_visited_offset(window) + n_states + 7) // 8 * 8
+
+
+def save(agent, path):
+    """Write the agent's Q-table, counters and trip_stats to path (atomically, through a temporary file)."""
+    save_table(agent.q_table, path, {name: getattr(agent, name) for name in counters}, agent.trip_stats)
+
+
+def save_table(table, path, values=None, trip_stats=None):
+    """Write a Q-table, a dict of counters (missing ones are saved as 0) and a TripStats (an empty one if None) to
+    path, like save()."""
+    values = values or {}
+    stats = trip_stats or TripStats()
+    n_states, n_actions = table.values.shape
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.pack(MAGIC, VERSION, 0, n_states, n_actions, *[values.get(name, 0) for name in counters] +
+                            [stats.window, len(stats._recent), stats.count, stats.failures,
+                             stats.last_failed_trip or 0, stats.mean, stats._m2]))
+        f.write(np.array(list(stats._recent) + [False] * (stats.window - len(stats._recent)), dtype=np.uint8).tobytes())
+        f.write(table.visited.astype(np.uint8).tobytes())
+        f.write('\0' * (_values_offset(n_states, stats.window) - _visited_offset(stats.window) - n_states))
+        f.write(table.values.astype('<f8').tobytes())
+    os.rename(tmp_path, path)
+
+
+def load(path, mmap=False):
+    """Return (QTable, counters dict) from a checkpoint, the dict also holding the TripStats under 'trip_stats'; with
+    mmap the table is a read-only memory map."""
+    with open(path, 'rb') as f:
+        fields = header.unpack(f.read(header.size))
+        magic, version, _, n_states, n_actions = fields[:5]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} Q-table checkpoint".format(path, VERSION))
+        window, n_recent, count, failures, last_failed_trip, mean, m2 = fields[5 + len(counters):]
+        recent = np.frombuffer(f.read(window), dtype=np.uint8)[:n_recent].astype(bool)
+    offset = _values_offset(n_states, window)
+
+    if mmap:
+        values = np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=(n_states, n_actions))
+        visited = np.memmap(path, dtype=np.bool_, mode='r', offset=_visited_offset(window), shape=(n_states,))
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+        values = np.frombuffer(data, dtype='<f8', count=n_states * n_actions, offset=offset).reshape(n_states, n_actions).copy()
+        visited = np.frombuffer(data, dtype=np.uint8, count=n_states, offset=_visited_offset(window)).astype(bool)
+
+    table = QTable(values=values)
+    table.visited = visited
+    stats = TripStats(window=window)
+    stats.count, stats.failures, stats.last_failed_trip = count, failures, last_failed_trip or None
+    stats.mean, stats._m2 = mean, m2
+    stats._recent.extend(bool(failed) for failed in recent)
+    stats._recent_failures = int(recent.sum())
+    values = dict(zip(counters, fields[5:5 + len(counters)]))
+    values['trip_stats'] = stats
+    return table, values
+
+
+def restore(agent, path, mmap=False):
+    """Warm-start an agent from a checkpoint: replace its Q-table, counters and trip_stats.
+
+    With mmap the Q-table is shared read-only, which only suits agents that no longer learn; a LearningAgent
+    would fail on its first update, so restoring one with mmap raises ValueError.
+    """
+    from agent import LearningAgent  # agent pulls in the environment, which load() does not need
+    if mmap and isinstance(agent, LearningAgent):
+        raise ValueError("cannot restore a LearningAgent from a read-only memory map; use mmap=False")
+    agent.q_table, values = load(path, mmap=mmap)
+    for name, value in values.iteritems():
+        setattr(agent, name, value)
@@ -0,0 +1,76 @@
+"""Convergence monitors for early stopping: Simulator.run(n_trials, monitor=...) stops once one says so.
+
+A monitor's converged(env) is called after every trial and returns True once training can stop. It
+judges the environment's primary agent (a LearningAgent). Simulator.run() then records how many
+trials it ran (sim.trials_run) and estimates the simulated steps saved (sim.steps_saved): the
+trials left unrun, at the mean length of the last ten trials.
+
+    sim.run(n_trials=100, monitor=NoRecentFailures(10))
+"""
+
+from collections import deque
+
+
+def check_agent(monitor, env, attribute):
+    """Raise TypeError unless env's primary agent has attribute (a dotted path), which monitor needs."""
+    agent = env.primary_agent
+    value = agent
+    for name in attribute.split('.'):
+        if not hasattr(value, name):
+            raise TypeError("{} needs a primary agent with {} (a LearningAgent), not {!r}".format(
+                type(monitor).__name__, attribute, agent))
+        value = getattr(value, name)
+
+
+class NoRecentFailures(object):
+    """Converged once the last k trips all succeeded."""
+
+    def __init__(self, k=10):
+        self.k = k
+        self.recent = deque(maxlen=k)  # whether each of the last k trips failed
+        self.trips = 0
+        self.failures = 0
+        self.checked = False
+
+    def converged(self, env):
+        if not self.checked:
+            check_agent(self, env, 'trip_stats')
+            self.checked = True
+        stats = env.primary_agent.trip_stats
+        failures = stats.failures - self.failures
+        successes = stats.count - self.trips - failures
+        self.recent.extend([True] * failures + [False] * successes)  # a trial ends at most one trip of each
+        self.trips, self.failures = stats.count, stats.failures
+        return len(self.recent) == self.k and not any(self.recent)
+
+
+class QTableDelta(object):
+    """Converged once the Q values moved by less than threshold on average (mean absolute change per entry) over the
+    last window trials.
+
+    With a constant alpha the table never settles completely (arrival bonuses keep shifting single values), so
+    changes are judged over several trials rather than trial by trial.
+    """
+
+    def __init__(self, threshold=0.002, window=10):
+        self.threshold = threshold
+        self.window = window
+        self.snapshots = deque(maxlen=window + 1)  # Q values after each of the last window + 1 trials
+
+    def converged(self, env):
+        if not self.snapshots:
+            check_agent(self, env, 'q_table.values')
+        values = env.primary_agent.q_table.values
+        self.snapshots.append(values.copy())
+        return len(self.snapshots) > self.window and abs(values - self.snapshots[0]).mean() < self.threshold
+
+
+class AllOf(object):
+    """Converged once every one of several monitors is (each is still updated after every trial)."""
+
+    def __init__(self, *monitors):
+        self.monitors = monitors
+
+    def converged(self, env):
+        return all([monitor.converged(env) for monitor in self.monitors])
+
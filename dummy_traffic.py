@@ -0,0 +1,162 @@
+"""Vectorized background traffic: all of an Environment's dummy agents, stepped together with NumPy.
+
+Environment(num_dummies=n, vectorized_dummies=True) keeps its dummies in a DummyTraffic engine
+instead of creating n DummyAgent objects, so that tens of thousands of them can drive around at
+interactive step rates. The primary agent (and any other agent) keeps using the scalar
+Environment.sense() and act().
+"""
+
+import bisect
+
+import numpy as np
+
+from environment import Environment, fold_inputs, sticky_waypoints
+
+sticky_codes = {relation: [Environment.valid_actions.index(waypoint) for waypoint in waypoints]
+                for relation, waypoints in sticky_waypoints.iteritems()}
+
+
+def sticky(waypoints, relation):
+    """Mask of the waypoint codes that stick for relation, see environment.sticky_waypoints."""
+    codes = sticky_codes[relation]
+    mask = waypoints == codes[0]
+    for code in codes[1:]:
+        mask |= waypoints == code
+    return mask
+
+
+class DummyTraffic(object):
+    """The dummy agents of an Environment, as parallel arrays.
+
+    Each dummy follows DummyAgent's rules: it senses its intersection, follows its waypoint when the
+    traffic rules allow it, and then draws a new random waypoint. Unlike Environment, which updates
+    agents one after another, all dummies sense the state at the start of the step and then move at
+    once. The environment's other agents update after them, and see the dummies as they would see
+    DummyAgents created before them.
+
+    Waypoints are integer codes indexing Environment.valid_actions; headings index
+    Environment.valid_headings.
+    """
+
+    NONE, FORWARD, LEFT, RIGHT = range(4)
+
+    heading_dx = np.array([h[0] for h in Environment.valid_headings])
+    heading_dy = np.array([h[1] for h in Environment.valid_headings])
+    turn = np.array([0, 0, 1, 3])  # heading change of each waypoint; left turns are h + 1, right turns h + 3 (mod 4)
+
+    def __init__(self, env, n, seed=None):
+        self.env = env
+        self.n = n
+        self.random = np.random.RandomState(seed)
+        self.x, self.y = self.random_locations()
+        self.heading = np.empty(n, dtype=int)
+        self.heading.fill(Environment.heading_index[(0, 1)])  # as set by Environment.create_agent()
+        self.waypoint = self.random.randint(self.FORWARD, self.RIGHT + 1, size=n)  # as drawn by DummyAgent()
+
+        # Traffic lights by cell, following the same switching rule as env.lights (see Environment.light_state())
+        self.light_state = np.array([light.start_state for light in env.lights], dtype=bool)
+        self.light_period = np.array([light.period for light in env.lights])
+        self.light_epoch = env.light_epoch
+
+        # Legality of each waypoint under env.rules, indexed by [red, oncoming, left, waypoint]
+        actions = Environment.valid_actions
+        self.legal = np.array([[[[env.rules.legal(light, oncoming, left, waypoint) for waypoint in actions] for left in actions]
+                                for oncoming in actions] for light in ['green', 'red']])
+
+    def random_locations(self):
+        bounds = self.env.bounds
+        return (self.random.randint(bounds[0], bounds[2] + 1, size=self.n),
+                self.random.randint(bounds[1], bounds[3] + 1, size=self.n))
+
+    def reset(self):
+        """Scatter the dummies with random headings, as Environment.reset() does with DummyAgents (waypoints are kept)."""
+        self.x, self.y = self.random_locations()
+        self.heading = self.random.randint(0, 4, size=self.n)
+
+    def cells(self):
+        """Environment.cell() of every dummy."""
+        bounds = self.env.bounds
+        return (self.x - bounds[0]) * (bounds[3] - bounds[1] + 1) + (self.y - bounds[1])
+
+    def lights(self, cells):
+        """Current light states (True = NS open) at an array of cells."""
+        env = self.env
+        for end in env.light_trial_ends[self.light_epoch:]:  # fold in the switches of trials that ended since
+            self.light_state ^= end // self.light_period % 2 == 1
+        self.light_epoch = env.light_epoch
+        return self.light_state[cells] != (env.light_time // self.light_period[cells] % 2 == 1)
+
+    def step(self):
+        """Advance every dummy by one time step."""
+        n = self.n
+        cells = self.cells()
+        heading = self.heading
+        waypoint = self.waypoint
+        red = self.lights(cells) != (heading % 2 == 1)  # headings 1 and 3 are N and S
+
+        # Sense the other agents (dummies first, then the environment's own agents, in agent_states order)
+        agents = self.env.agents
+        others = xrange(len(agents.agents))
+        rank, (oncoming, left, _) = self.aggregate(
+            np.concatenate((cells, np.array([self.env.cell(agents.x[i], agents.y[i]) for i in others], dtype=int))),
+            np.concatenate((heading, np.array([agents.heading[i] for i in others], dtype=int))),
+            np.concatenate((waypoint, np.array([Environment.valid_actions.index(agents.agents[i].get_next_waypoint()) for i in others], dtype=int))))
+        slot = rank[:n] * 4
+        oncoming = oncoming[slot + (heading + 2) % 4]
+        left = left[slot + (heading + 3) % 4]
+
+        # DummyAgent.update(): follow the waypoint when traffic rules allow it
+        okay = self.legal[red.astype(int), oncoming, left, waypoint]
+
+        # Move (wrap-around) and draw new waypoints
+        bounds = self.env.bounds
+        heading = np.where(okay, (heading + self.turn[waypoint]) % 4, heading)
+        self.x = (self.x + self.heading_dx[heading] * okay - bounds[0]) % (bounds[2] - bounds[0] + 1) + bounds[0]
+        self.y = (self.y + self.heading_dy[heading] * okay - bounds[1]) % (bounds[3] - bounds[1] + 1) + bounds[1]
+        self.heading = heading
+        self.waypoint = np.where(okay, self.random.randint(self.FORWARD, self.RIGHT + 1, size=n), waypoint)
+
+    def aggregate(self, cells, headings, waypoints):
+        """Group agents (given in agent order) by cell and heading, and fold each group into inputs.
+
+        Return (rank, (oncoming, left, right)): the index of each agent's cell among the sorted
+        distinct cells, and the inputs that the agents with heading h at the distinct cell with index
+        r produce (at position r * 4 + h) when seen as oncoming traffic, as traffic from the left and
+        as traffic from the right; NONE where there are no such agents. Each group is folded like
+        environment.fold_inputs() folds agents one at a time: the first sticky waypoint, else the last.
+        """
+        n = len(cells)
+        if n == 0:
+            return np.zeros(0, dtype=int), (np.zeros(0, dtype=int),) * 3
+        keys = cells * 4 + headings
+        order = np.argsort(keys, kind='mergesort')  # stable, so agents keep their order within each group
+        keys = keys[order]
+        waypoints = waypoints[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        new_cell = np.concatenate(([True], keys[1:] // 4 != keys[:-1] // 4))
+        cell_rank = np.cumsum(new_cell) - 1
+        rank = np.empty(n, dtype=int)
+        rank[order] = cell_rank
+
+        # Per (cell, heading) group: its first waypoint that sticks, else its last waypoint
+        last = waypoints[np.concatenate((starts[1:], [n])) - 1]
+        groups = cell_rank[starts] * 4 + keys[starts] % 4
+        inputs = []
+        for relation in ('oncoming', 'left', 'right'):
+            codes = sticky_codes[relation]
+            if len(codes) == 1:  # the sticky waypoint itself, if any agent of the group has it
+                group_inputs = np.where(np.logical_or.reduceat(sticky(waypoints, relation), starts), codes[0], last)
+            else:
+                first = np.minimum.reduceat(np.where(sticky(waypoints, relation), np.arange(n), n), starts)
+                group_inputs = np.where(first < n, waypoints[np.minimum(first, n - 1)], last)
+            table = np.zeros(np.count_nonzero(new_cell) * 4, dtype=int)
+            table[groups] = group_inputs
+            inputs.append(table)
+        return rank, tuple(inputs)
+
+    def inputs_at(self, cell, heading):
+        """(oncoming, left, right) that the dummies present to an agent at cell with the given heading."""
+        here = np.flatnonzero(self.cells() == cell)
+        waypoints = self.waypoint[here].tolist()
+        return fold_inputs(Environment.relative_heading[heading], xrange(len(here)), self.heading[here].tolist(),
+                           lambda k: Environment.valid_actions[waypoints[k]])
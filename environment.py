@@ -1,221 +1,489 @@
-import time
 import random
+import bisect
+import logging
+from array import array
 from collections import OrderedDict
 
-from simulator import Simulator
+from rules import get_rules
+
+log = logging.getLogger(__name__)
+
+# What an agent senses of the other agents at its intersection, per relation (see Environment.relative_heading): the
+# waypoint of the first of them whose waypoint is sticky for that relation, otherwise of the last of them
+sticky_waypoints = {'oncoming': ('left',), 'left': ('forward',), 'right': ('forward', 'left')}
+
+
+def fold_inputs(relative_heading, occupants, headings, waypoint_of, inputs=(None, None, None),
+                sticky_oncoming=sticky_waypoints['oncoming'], sticky_left=sticky_waypoints['left'], sticky_right=sticky_waypoints['right']):
+    """Fold the agents at an intersection (occupants, in agent order, with headings[j] and waypoint_of(j) for each j)
+    into the (oncoming, left, right) inputs of an agent that sees them through relative_heading (its row of
+    Environment.relative_heading).
+
+    Folding continues from inputs, so agents can be folded in batches. Agents heading the same way are ignored. (The
+    sticky_* defaults bind sticky_waypoints as locals; this runs on every sense() and act().)
+    """
+    oncoming, left, right = inputs
+    for j in occupants:
+        relation = relative_heading[headings[j]]
+        if relation == 'oncoming':
+            if oncoming not in sticky_oncoming:
+                oncoming = waypoint_of(j)
+        elif relation == 'right':
+            if right not in sticky_right:
+                right = waypoint_of(j)
+        elif relation == 'left':
+            if left not in sticky_left:
+                left = waypoint_of(j)
+    return oncoming, left, right
+
 
 class TrafficLight(object):
-    """A traffic light that switches periodically."""
+    """A traffic light that switches periodically.
 
-    valid_states = [True, False]  # True = NS open, False = EW open
+    Environment does not poll its lights: since a light switches every period steps from the start of
+    each trial, its state at any time follows from start_state, its state when the trial began (see
+    state_at()). The state property reads it at the owning environment's current time.
+    """
 
-    def __init__(self, state=None, period=None):
-        self.state = state if state is not None else random.choice(self.valid_states)
-        self.period = period if period is not None else random.choice([3, 4, 5])
-        self.last_updated = 0
+    __slots__ = ('start_state', 'period', 'epoch', 'env')  # there is one per intersection, so keep them small
 
-    def reset(self):
-        self.last_updated = 0
+    valid_states = [True, False]  # True = NS open, False = EW open
 
-    def update(self, t):
-        if t - self.last_updated >= self.period:
-            self.state = not self.state  # assuming state is boolean
-            self.last_updated = t
+    def __init__(self, state=None, period=None, rng=random, env=None):
+        self.start_state = state if state is not None else rng.choice(self.valid_states)
+        self.period = period if period is not None else rng.choice([3, 4, 5])
+        self.epoch = 0  # number of trials whose switches are folded into start_state
+        self.env = env  # the Environment whose clock the light follows; without one, state is start_state
+
+    @property
+    def state(self):
+        """Current state (True = NS open), as Environment.light_state() computes it."""
+        env = self.env
+        if env is None:
+            return self.start_state
+        if self.epoch != env.light_epoch:
+            self.catch_up(env.light_trial_ends)
+        return self.state_at(env.light_time)
+
+    def state_at(self, t):
+        """State at time t of the current trial, which began in start_state."""
+        return self.start_state != (t // self.period % 2 == 1)
+
+    def catch_up(self, trial_ends):
+        """Fold the switches of finished trials into start_state; trial_ends[k] is the last update time of trial k."""
+        for k in xrange(self.epoch, len(trial_ends)):
+            self.start_state = self.state_at(trial_ends[k])
+        self.epoch = len(trial_ends)
+
+
+class AgentStateStore(object):
+    """Struct-of-arrays storage for the state of every agent in an Environment.
+
+    The state of the agent with index i lives at position i of parallel arrays: location (x, y),
+    heading (an index into Environment.valid_headings), destination (dest_x, dest_y; 0 when there is
+    none) and deadline (only meaningful where has_deadline is set). Resets and moves overwrite these
+    entries in place.
+    """
+
+    def __init__(self):
+        self.agents = []
+        self.x = array('i')
+        self.y = array('i')
+        self.heading = array('b')
+        self.dest_x = array('i')
+        self.dest_y = array('i')
+        self.deadline = array('i')
+        self.has_deadline = array('b')
+
+    def next_waypoint(self, i):
+        return self.agents[i].get_next_waypoint()
+
+    def add(self, agent, location, heading):
+        """Append an agent and return its AgentState handle."""
+        self.agents.append(agent)
+        self.x.append(location[0])
+        self.y.append(location[1])
+        self.heading.append(heading)
+        self.dest_x.append(0)
+        self.dest_y.append(0)
+        self.deadline.append(0)
+        self.has_deadline.append(False)
+        return AgentState(self, len(self.agents) - 1)
+
+
+class AgentState(object):
+    """Handle on one agent's entry in an AgentStateStore.
+
+    Supports the read-only dict-style access of the former per-agent state dicts:
+    state['location'], state['heading'], state['destination'] and state['deadline'].
+    """
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        store, i = self.store, self.index
+        if key == 'location':
+            return (store.x[i], store.y[i])
+        elif key == 'heading':
+            return Environment.valid_headings[store.heading[i]]
+        elif key == 'destination':
+            return (store.dest_x[i], store.dest_y[i]) if store.dest_x[i] else None
+        elif key == 'deadline':
+            return store.deadline[i] if store.has_deadline[i] else None
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 
 class Environment(object):
-    """Environment within which all agents operate."""
+    """Environment within which all agents operate.
+
+    All of its random draws (lights, trips, dummy agents) come from its own streams: the setup and the
+    seed of each trial are drawn from a stream seeded with seed (drawn from the random module when
+    None), and each trial then draws from a stream seeded with its trial_seed, so any trial can be
+    replayed (see recording.py).
+    """
 
     valid_actions = [None, 'forward', 'left', 'right']
     valid_inputs = {'light': TrafficLight.valid_states, 'oncoming': valid_actions, 'left': valid_actions, 'right': valid_actions}
     valid_headings = [(1, 0), (0, -1), (-1, 0), (0, 1)]  # ENWS
+    heading_index = {heading: i for i, heading in enumerate(valid_headings)}
+    # relative_heading[h][other_h]: where an agent heading other_h comes from, as seen by an agent heading h
+    # ('same' direction, 'oncoming', from the 'right' or from the 'left'); left turns are h + 1, right turns h + 3 (mod 4)
+    relative_heading = [[('same', 'right', 'oncoming', 'left')[(other_h - h) % 4] for other_h in xrange(4)] for h in xrange(4)]
     hard_time_limit = -100  # even if enforce_deadline is False, end trial when deadline reaches this value (to avoid deadlocks)
+    min_trip_dist = 4  # minimum L1 distance between a trial's start and destination
 
-    def __init__(self, num_dummies=12):
+    def __init__(self, num_dummies=12, grid_size=(8, 6), vectorized_dummies=False, seed=None, rules=None):
         self.num_dummies = num_dummies  # no. of dummy agents
+        self.rules = get_rules(rules)  # traffic rules and rewards, see rules.RuleSet
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.seeds = random.Random(self.seed)  # draws the setup and the seed of each trial
+        self.random = self.seeds  # stream of the current trial, see reset()
+        self.trial_seed = None
 
         # Initialize simulation variables
         self.done = False
         self.t = 0
-        self.agent_states = OrderedDict()
-        self.status_text = ""
+        self.agents = AgentStateStore()
+        self.agent_states = OrderedDict()  # agent -> AgentState handle on its entry in self.agents
+        self.occupancy = {}  # cell -> sorted list of the indices of the agents at that intersection, maintained by act()
+        self.status = None  # (state, action, reward) of the primary agent's last move, see status_text
 
         # Road network
-        self.grid_size = (8, 6)  # (cols, rows)
+        self.grid_size = tuple(grid_size)  # (cols, rows)
         self.bounds = (1, 1, self.grid_size[0], self.grid_size[1])
         self.block_size = 100
-        self.intersections = OrderedDict()
-        self.roads = []
+        self.intersections = {}  # location -> TrafficLight; a plain dict, since self.locations keeps the order
+        self.locations = []  # intersection locations by cell (column by column), see cell()
+        self.lights = []  # traffic lights by cell, read through light_state()
+        self.light_time = 0  # time of the latest light update in this trial
+        self.light_trial_ends = []  # light_time at the end of each earlier trial, see TrafficLight.catch_up()
+        self.light_epoch = 0  # len(light_trial_ends)
         for x in xrange(self.bounds[0], self.bounds[2] + 1):
             for y in xrange(self.bounds[1], self.bounds[3] + 1):
-                self.intersections[(x, y)] = TrafficLight()  # a traffic light at each intersection
-
-        for a in self.intersections:
-            for b in self.intersections:
-                if a == b:
-                    continue
-                if (abs(a[0] - b[0]) + abs(a[1] - b[1])) == 1:  # L1 distance = 1
-                    self.roads.append((a, b))
-
-        # Dummy agents
-        for i in xrange(self.num_dummies):
-            self.create_agent(DummyAgent)
+                traffic_light = TrafficLight(rng=self.random, env=self)  # a traffic light at each intersection
+                self.intersections[(x, y)] = traffic_light
+                self.locations.append((x, y))
+                self.lights.append(traffic_light)
+
+        self._roads = None  # built on first use, see roads
+
+        # Start/destination sampling, see random_trip(): intersections fall into groups that have the same number
+        # of possible destinations, because that number only depends on how close they are to the edges
+        self.trip_groups, self.trip_group_weights = self.compute_trip_groups()
+
+        # Dummy agents, either as DummyAgents or all together in a dummy_traffic.DummyTraffic engine (needs NumPy)
+        self.dummy_traffic = None
+        if vectorized_dummies:
+            from dummy_traffic import DummyTraffic
+            self.dummy_traffic = DummyTraffic(self, self.num_dummies, seed=self.random.getrandbits(32))
+        else:
+            for i in xrange(self.num_dummies):
+                self.create_agent(DummyAgent)
 
         # Primary agent and associated parameters
         self.primary_agent = None  # to be set explicitly
         self.enforce_deadline = False
 
+        # Optional profiling.PhaseProfiler, see enable_profiling()
+        self.profiler = None
+
+        # Objects notified of the start of each trial and of the primary agent's actions, through their
+        # trial_started(env) and primary_acted(env, action, reward) methods (e.g. recording.TrialRecorder)
+        self.observers = []
+
     def create_agent(self, agent_class, *args, **kwargs):
         agent = agent_class(self, *args, **kwargs)
-        self.agent_states[agent] = {'location': random.choice(self.intersections.keys()), 'heading': (0, 1)}
+        location = self.random.choice(self.locations)
+        state = self.agent_states[agent] = self.agents.add(agent, location, self.heading_index[(0, 1)])
+        self.occupancy.setdefault(self.cell(*location), []).append(state.index)
         return agent
 
+    def cell(self, x, y):
+        """Index of the intersection at (x, y) in self.locations (and self.lights)."""
+        return (x - self.bounds[0]) * (self.bounds[3] - self.bounds[1] + 1) + (y - self.bounds[1])
+
     def set_primary_agent(self, agent, enforce_deadline=False):
         self.primary_agent = agent
         self.enforce_deadline = enforce_deadline
 
-    def reset(self):
+    def enable_profiling(self, profiler):
+        """Charge the phases of step(), and every sense() and act() call, to a profiling.PhaseProfiler."""
+        self.disable_profiling()
+        self.profiler = profiler
+        self.sense = profiler.timed('environment.sense', self.sense)
+        self.act = profiler.timed('environment.act', self.act)
+
+    def disable_profiling(self):
+        if self.profiler is not None:
+            self.profiler = None
+            del self.sense, self.act  # back to the plain methods
+
+    def reset(self, seed=None):
+        """Start a new trial, drawing from a stream seeded with seed (by default, the next seed from self.seeds)."""
         self.done = False
         self.t = 0
+        self.trial_seed = seed if seed is not None else self.seeds.getrandbits(32)
+        self.random = random.Random(self.trial_seed)
 
-        # Reset traffic lights
-        for traffic_light in self.intersections.itervalues():
-            traffic_light.reset()
-
-        # Pick a start and a destination
-        start = random.choice(self.intersections.keys())
-        destination = random.choice(self.intersections.keys())
+        # Reset traffic lights (each one catches up with the trials it missed when it is next looked at)
+        self.light_trial_ends.append(self.light_time)
+        self.light_epoch = len(self.light_trial_ends)
+        self.light_time = 0
 
-        # Ensure starting location and destination are not too close
-        while self.compute_dist(start, destination) < 4:
-            start = random.choice(self.intersections.keys())
-            destination = random.choice(self.intersections.keys())
+        # Pick a start and a destination that are not too close
+        start, destination = self.random_trip()
 
-        start_heading = random.choice(self.valid_headings)
+        start_heading = self.random.choice(self.valid_headings)
         deadline = self.compute_dist(start, destination) * 5
-        print "Environment.reset(): Trial set up with start = {}, destination = {}, deadline = {}".format(start, destination, deadline)
+        log.info("Environment.reset(): Trial set up with start = %s, destination = %s, deadline = %s", start, destination, deadline)
 
         # Initialize agent(s)
-        for agent in self.agent_states.iterkeys():
-            self.agent_states[agent] = {
-                'location': start if agent is self.primary_agent else random.choice(self.intersections.keys()),
-                'heading': start_heading if agent is self.primary_agent else random.choice(self.valid_headings),
-                'destination': destination if agent is self.primary_agent else None,
-                'deadline': deadline if agent is self.primary_agent else None}
+        if self.dummy_traffic is not None:
+            self.dummy_traffic.random.seed(self.random.getrandbits(32))
+            self.dummy_traffic.reset()
+        agents = self.agents
+        for i, agent in enumerate(agents.agents):
+            if agent is self.primary_agent:
+                agents.x[i], agents.y[i] = start
+                agents.heading[i] = self.heading_index[start_heading]
+                agents.dest_x[i], agents.dest_y[i] = destination
+                agents.deadline[i] = deadline
+                agents.has_deadline[i] = True
+            else:
+                agents.x[i], agents.y[i] = self.random.choice(self.locations)
+                agents.heading[i] = self.heading_index[self.random.choice(self.valid_headings)]
+                agents.dest_x[i] = agents.dest_y[i] = 0
+                agents.has_deadline[i] = False
             agent.reset(destination=(destination if agent is self.primary_agent else None))
 
+        # Rebuild the occupancy index (agents are visited in order, so each list comes out sorted)
+        for indices in self.occupancy.itervalues():
+            del indices[:]
+        for i in xrange(len(agents.agents)):
+            self.occupancy.setdefault(self.cell(agents.x[i], agents.y[i]), []).append(i)
+
+        for observer in self.observers:
+            observer.trial_started(self)
+
     def step(self):
         #print "Environment.step(): t = {}".format(self.t)  # [debug]
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
 
-        # Update traffic lights
-        for intersection, traffic_light in self.intersections.iteritems():
-            traffic_light.update(self.t)
+        # Update traffic lights (their states are computed when they are looked at)
+        self.light_time = self.t
 
         # Update agents
-        for agent in self.agent_states.iterkeys():
-            agent.update(self.t)
-
-        if self.done:
-            return  # primary agent might have reached destination
+        if profiler is None:
+            if self.dummy_traffic is not None:
+                self.dummy_traffic.step()
+            for agent in self.agent_states.iterkeys():
+                agent.update(self.t)
+        else:
+            start = profiler.lap('environment.lights', start)
+            if self.dummy_traffic is not None:
+                self.dummy_traffic.step()
+                start = profiler.lap('environment.update.DummyTraffic', start)
+            for agent in self.agent_states.iterkeys():
+                agent.update(self.t)
+                start = profiler.lap('environment.update.' + agent.__class__.__name__, start)
+
+        if self.done:  # primary agent might have reached destination
+            if profiler is not None:
+                profiler.lap('environment.deadline', start)
+            return
 
         if self.primary_agent is not None:
-            agent_deadline = self.agent_states[self.primary_agent]['deadline']
+            i = self.agent_states[self.primary_agent].index
+            agent_deadline = self.agents.deadline[i]
             if agent_deadline <= self.hard_time_limit:
                 self.done = True
-                print "Environment.step(): Primary agent hit hard time limit ({})! Trial aborted.".format(self.hard_time_limit)
+                log.info("Environment.step(): Primary agent hit hard time limit (%s)! Trial aborted.", self.hard_time_limit)
             elif self.enforce_deadline and agent_deadline <= 0:
                 self.done = True
-                print "Environment.step(): Primary agent ran out of time! Trial aborted."
-            self.agent_states[self.primary_agent]['deadline'] = agent_deadline - 1
+                log.info("Environment.step(): Primary agent ran out of time! Trial aborted.")
+            self.agents.deadline[i] = agent_deadline - 1
 
         self.t += 1
+        if profiler is not None:
+            profiler.lap('environment.deadline', start)
+
+    def light_state(self, cell):
+        """Current state of the traffic light at a cell (True = NS open)."""
+        light = self.lights[cell]
+        if light.epoch != self.light_epoch:
+            light.catch_up(self.light_trial_ends)
+        return light.start_state != (self.light_time // light.period % 2 == 1)  # light.state_at(self.light_time), inlined
 
     def sense(self, agent):
         assert agent in self.agent_states, "Unknown agent!"
 
-        state = self.agent_states[agent]
-        location = state['location']
-        heading = state['heading']
-        light = 'green' if (self.intersections[location].state and heading[1] != 0) or ((not self.intersections[location].state) and heading[0] != 0) else 'red'
-
-        # Populate oncoming, left, right
-        oncoming = None
-        left = None
-        right = None
-        for other_agent, other_state in self.agent_states.iteritems():
-            if agent == other_agent or location != other_state['location'] or (heading[0] == other_state['heading'][0] and heading[1] == other_state['heading'][1]):
-                continue
-            other_heading = other_agent.get_next_waypoint()
-            if (heading[0] * other_state['heading'][0] + heading[1] * other_state['heading'][1]) == -1:
-                if oncoming != 'left':  # we don't want to override oncoming == 'left'
-                    oncoming = other_heading
-            elif (heading[1] == other_state['heading'][0] and -heading[0] == other_state['heading'][1]):
-                if right != 'forward' and right != 'left':  # we don't want to override right == 'forward or 'left'
-                    right = other_heading
-            else:
-                if left != 'forward':  # we don't want to override left == 'forward'
-                    left = other_heading
-
+        agents = self.agents
+        i = self.agent_states[agent].index
+        x, y, h = agents.x[i], agents.y[i], agents.heading[i]
+        cell = self.cell(x, y)
+        light = 'green' if self.light_state(cell) == (h % 2 == 1) else 'red'  # headings 1 and 3 are N and S
+        oncoming, left, right = self.inputs_at(cell, h)
         return {'light': light, 'oncoming': oncoming, 'left': left, 'right': right}
 
+    def inputs_at(self, cell, h):
+        """(oncoming, left, right) inputs sensed at cell by an agent heading h."""
+        # Only agents at the same intersection matter, in agent_states order
+        agents = self.agents
+        inputs = (None, None, None)
+        if self.dummy_traffic is not None:  # its dummies come before the agents in agent_states
+            inputs = self.dummy_traffic.inputs_at(cell, h)
+        occupants = self.occupancy[cell]
+        if len(occupants) == 1 and agents.heading[occupants[0]] == h:
+            return inputs  # only the sensing agent itself, the usual case
+        return fold_inputs(self.relative_heading[h], occupants, agents.heading, agents.next_waypoint, inputs)
+
     def get_deadline(self, agent):
-        return self.agent_states[agent]['deadline'] if agent is self.primary_agent else None
+        return self.agents.deadline[self.agent_states[agent].index] if agent is self.primary_agent else None
 
     def act(self, agent, action):
         assert agent in self.agent_states, "Unknown agent!"
         assert action in self.valid_actions, "Invalid action!"
 
-        state = self.agent_states[agent]
-        location = state['location']
-        heading = state['heading']
-        light = 'green' if (self.intersections[location].state and heading[1] != 0) or ((not self.intersections[location].state) and heading[0] != 0) else 'red'
-        inputs = self.sense(agent)
-
-        # Move agent if within bounds and obeys traffic rules
-        reward = 0  # reward/penalty
-        move_okay = True
-        if action == 'forward':
-            if light != 'green':
-                move_okay = False
-        elif action == 'left':
-            if light == 'green' and (inputs['oncoming'] == None or inputs['oncoming'] == 'left'):
-                heading = (heading[1], -heading[0])
-            else:
-                move_okay = False
-        elif action == 'right':
-            if light == 'green' or inputs['left'] != 'forward':
-                heading = (-heading[1], heading[0])
-            else:
-                move_okay = False
-
-        if move_okay:
-            # Valid move (could be null)
-            if action is not None:
-                # Valid non-null move
-                location = ((location[0] + heading[0] - self.bounds[0]) % (self.bounds[2] - self.bounds[0] + 1) + self.bounds[0],
-                            (location[1] + heading[1] - self.bounds[1]) % (self.bounds[3] - self.bounds[1] + 1) + self.bounds[1])  # wrap-around
-                #if self.bounds[0] <= location[0] <= self.bounds[2] and self.bounds[1] <= location[1] <= self.bounds[3]:  # bounded
-                state['location'] = location
-                state['heading'] = heading
-                reward = 2.0 if action == agent.get_next_waypoint() else -0.5  # valid, but is it correct? (as per waypoint)
-            else:
-                # Valid null move
-                reward = 0.0
-        else:
-            # Invalid move
-            reward = -1.0
+        agents = self.agents
+        i = self.agent_states[agent].index
+        x, y, heading = agents.x[i], agents.y[i], agents.heading[i]
+        cell = self.cell(x, y)
+        light = 'green' if self.light_state(cell) == (heading % 2 == 1) else 'red'
+        oncoming, left, _ = self.inputs_at(cell, heading)
+
+        # Move agent if it obeys traffic rules (see rules.RuleSet): turn is None for a null or illegal move
+        turn, reward = self.rules.outcomes[(light, oncoming, left, action, action is not None and action == agent.get_next_waypoint())]
+        if turn is not None:
+            heading = (heading + turn) % 4
+            dx, dy = self.valid_headings[heading]
+            new_x = (x + dx - self.bounds[0]) % (self.bounds[2] - self.bounds[0] + 1) + self.bounds[0]
+            new_y = (y + dy - self.bounds[1]) % (self.bounds[3] - self.bounds[1] + 1) + self.bounds[1]  # wrap-around
+            #if self.bounds[0] <= location[0] <= self.bounds[2] and self.bounds[1] <= location[1] <= self.bounds[3]:  # bounded
+            self.occupancy[cell].remove(i)
+            bisect.insort(self.occupancy.setdefault(self.cell(new_x, new_y), []), i)
+            agents.x[i] = new_x
+            agents.y[i] = new_y
+            agents.heading[i] = heading
 
         if agent is self.primary_agent:
-            if state['location'] == state['destination']:
-                if state['deadline'] >= 0:
-                    reward += 10  # bonus
+            if agents.x[i] == agents.dest_x[i] and agents.y[i] == agents.dest_y[i]:
+                if agents.deadline[i] >= 0:
+                    reward += self.rules.arrival_bonus
                 self.done = True
-                print "Environment.act(): Primary agent has reached destination!"  # [debug]
-            self.status_text = "state: {}\naction: {}\nreward: {}".format(agent.get_state(), action, reward)
+                log.info("Environment.act(): Primary agent has reached destination!")
+            self.status = (agent.get_state(), action, reward)  # formatted on demand, by status_text
+            for observer in self.observers:
+                observer.primary_acted(self, action, reward)
             #print "Environment.act() [POST]: location: {}, heading: {}, action: {}, reward: {}".format(location, heading, action, reward)  # [debug]
 
         return reward
 
+    @property
+    def status_text(self):
+        return "state: {}\naction: {}\nreward: {}".format(*self.status) if self.status is not None else ""
+
+    @property
+    def roads(self):
+        """Pairs of intersections at L1 distance 1 (in both directions), built when first needed (e.g. for display)."""
+        if self._roads is None:
+            # Only the (up to) four neighbours of each intersection are considered, in the same order as a scan over
+            # all intersections would find them
+            self._roads = []
+            for a in self.locations:
+                for b in ((a[0] - 1, a[1]), (a[0], a[1] - 1), (a[0], a[1] + 1), (a[0] + 1, a[1])):
+                    if b in self.intersections:
+                        self._roads.append((a, b))
+        return self._roads
+
+    def near_count(self, location):
+        """Number of intersections closer than min_trip_dist to location (including itself)."""
+        reach = self.min_trip_dist - 1
+        count = 0
+        for x in xrange(max(location[0] - reach, self.bounds[0]), min(location[0] + reach, self.bounds[2]) + 1):
+            spare = reach - abs(x - location[0])
+            count += min(location[1] + spare, self.bounds[3]) - max(location[1] - spare, self.bounds[1]) + 1
+        return count
+
+    def compute_trip_groups(self):
+        """Group intersections by their distance to the edges (capped at min_trip_dist - 1).
+
+        Return the groups as (xs, ys) pairs, and the cumulative number of valid (start, destination)
+        pairs up to each group.
+        """
+        reach = self.min_trip_dist - 1
+
+        def edge_classes(low, high):
+            classes = OrderedDict()
+            for v in xrange(low, high + 1):
+                classes.setdefault((min(v - low, reach), min(high - v, reach)), []).append(v)
+            return classes.values()
+
+        n = len(self.locations)
+        groups, weights, total = [], [], 0
+        for xs in edge_classes(self.bounds[0], self.bounds[2]):
+            for ys in edge_classes(self.bounds[1], self.bounds[3]):
+                total += len(xs) * len(ys) * (n - self.near_count((xs[0], ys[0])))
+                groups.append((xs, ys))
+                weights.append(total)
+        return groups, weights
+
+    def random_trip(self):
+        """Draw a (start, destination) pair uniformly from all pairs at least min_trip_dist apart.
+
+        The start is drawn with weight proportional to its number of valid destinations (through its
+        group), then the destination is drawn directly among those, skipping the few intersections
+        that are too close; no rejection loop is needed.
+        """
+        if not self.trip_group_weights[-1]:
+            raise ValueError("No start/destination pairs are {} apart on a {} grid".format(self.min_trip_dist, self.grid_size))
+        xs, ys = self.trip_groups[bisect.bisect_right(self.trip_group_weights, self.random.random() * self.trip_group_weights[-1])]
+        start = (self.random.choice(xs), self.random.choice(ys))
+
+        # Index the k-th valid destination among the cells, counting up past the cells that are too close
+        reach = self.min_trip_dist - 1
+        near = [self.cell(x, y)
+                for x in xrange(max(start[0] - reach, self.bounds[0]), min(start[0] + reach, self.bounds[2]) + 1)
+                for y in xrange(max(start[1] - reach + abs(x - start[0]), self.bounds[1]), min(start[1] + reach - abs(x - start[0]), self.bounds[3]) + 1)]
+        cell = self.random.randrange(len(self.locations) - len(near))
+        for near_cell in near:  # in increasing order
+            if near_cell <= cell:
+                cell += 1
+            else:
+                break
+        return start, self.locations[cell]
+
     def compute_dist(self, a, b):
         """L1 distance between two points."""
         return abs(b[0] - a[0]) + abs(b[1] - a[1])
@@ -248,27 +516,18 @@ class DummyAgent(Agent):
 
     def __init__(self, env):
         super(DummyAgent, self).__init__(env)  # sets self.env = env, state = None, next_waypoint = None, and a default color
-        self.next_waypoint = random.choice(Environment.valid_actions[1:])
-        self.color = random.choice(self.color_choices)
+        self.next_waypoint = env.random.choice(Environment.valid_actions[1:])  # dummies draw from the environment's streams
+        self.color = env.random.choice(self.color_choices)
 
     def update(self, t):
         inputs = self.env.sense(self)
 
-        action_okay = True
-        if self.next_waypoint == 'right':
-            if inputs['light'] == 'red' and inputs['left'] == 'forward':
-                action_okay = False
-        elif self.next_waypoint == 'forward':
-            if inputs['light'] == 'red':
-                action_okay = False
-        elif self.next_waypoint == 'left':
-            if inputs['light'] == 'red' or (inputs['oncoming'] == 'forward' or inputs['oncoming'] == 'right'):
-                action_okay = False
+        action_okay = self.env.rules.legal(inputs['light'], inputs['oncoming'], inputs['left'], self.next_waypoint)
 
         action = None
         if action_okay:
             action = self.next_waypoint
-            self.next_waypoint = random.choice(Environment.valid_actions[1:])
+            self.next_waypoint = self.env.random.choice(Environment.valid_actions[1:])
         reward = self.env.act(self, action)
         #print "DummyAgent.update(): t = {}, inputs = {}, action = {}, reward = {}".format(t, inputs, action, reward)  # [debug]
         #print "DummyAgent.update(): next_waypoint = {}".format(self.next_waypoint)  # [debug]
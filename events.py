@@ -0,0 +1,44 @@
+import json
+
+
+class EventSink(object):
+    """Buffered JSON-lines writer for per-step event records.
+
+    Records are plain dicts; they are only serialized when the buffer is flushed, so emitting a
+    record costs a list append.
+    """
+
+    def __init__(self, path, buffer_size=1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.file = open(path, 'a')
+
+    def emit(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(''.join(json.dumps(record) + '\n' for record in self.buffer))
+            self.file.flush()
+            self.buffer = []
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_events(path):
+    """Yield the records stored in a JSON-lines event file."""
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,92 @@
+"""Experience replay for LearningAgent: a fixed-capacity memory of transitions, replayed in batches.
+
+LearningAgent(replay=ReplayMemory(...)) stores every transition it learns from and, every
+replay_every steps, replays a sampled batch through QTable.update_batch(), so each simulated step is
+learned from more than once. A transition is (state, action, reward, next_state, next_action): the
+agent's update rule looks at the action actually taken in the next state.
+
+Which transitions are dropped once the memory is full, and which are sampled, are chosen by name
+from eviction_policies and sampling_policies.
+"""
+
+import numpy as np
+
+
+def evict_fifo(memory):
+    """Overwrite the oldest transition (the memory is a ring buffer)."""
+    return memory.added % memory.capacity
+
+
+def evict_reservoir(memory):
+    """Reservoir sampling: keep a uniform sample of every transition seen so far; None drops the new one."""
+    slot = memory.random.randint(memory.added + 1)
+    return slot if slot < memory.capacity else None
+
+
+def sample_uniform(memory, batch_size):
+    return memory.random.randint(memory.size, size=batch_size)
+
+
+def sample_recent(memory, batch_size):
+    """Sample among the transitions added in the last memory.recent additions; if eviction has dropped them all (as
+    reservoir eviction can), among the memory.recent most recently added transitions still held."""
+    if memory.size <= memory.recent:
+        return memory.random.randint(memory.size, size=batch_size)
+    slots = np.flatnonzero(memory.order[:memory.size] >= memory.added - memory.recent)
+    if len(slots) == 0:
+        slots = np.argsort(memory.order[:memory.size])[-memory.recent:]
+    return slots[memory.random.randint(len(slots), size=batch_size)]
+
+
+eviction_policies = {
+    'fifo': evict_fifo,
+    'reservoir': evict_reservoir,
+}
+
+sampling_policies = {
+    'uniform': sample_uniform,
+    'recent': sample_recent,
+}
+
+
+class ReplayMemory(object):
+    """Transitions in parallel NumPy arrays, with configurable eviction and sampling."""
+
+    def __init__(self, capacity=10000, eviction='fifo', sampling='uniform', recent=1000, seed=None):
+        self.capacity = capacity
+        self.evict = eviction_policies[eviction]
+        self.sample_slots = sampling_policies[sampling]
+        self.recent = recent  # window of sample_recent()
+        self.random = np.random.RandomState(seed)
+        self.state = np.zeros(capacity, dtype=np.int32)
+        self.action = np.zeros(capacity, dtype=np.int8)  # codes indexing QTable.actions
+        self.reward = np.zeros(capacity)
+        self.next_state = np.zeros(capacity, dtype=np.int32)
+        self.next_action = np.zeros(capacity, dtype=np.int8)
+        self.order = np.zeros(capacity, dtype=np.int64)  # number of transitions added before each one
+        self.size = 0
+        self.added = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, next_action):
+        """Store a transition (actions as codes), evicting one when the memory is full."""
+        if self.size < self.capacity:
+            slot = self.size
+            self.size += 1
+        else:
+            slot = self.evict(self)
+        if slot is not None:
+            self.state[slot] = state
+            self.action[slot] = action
+            self.reward[slot] = reward
+            self.next_state[slot] = next_state
+            self.next_action[slot] = next_action
+            self.order[slot] = self.added
+        self.added += 1
+
+    def sample(self, batch_size):
+        """Return (states, actions, rewards, next_states, next_actions) arrays for a batch of stored transitions."""
+        slots = self.sample_slots(self, batch_size)
+        return self.state[slots], self.action[slots], self.reward[slots], self.next_state[slots], self.next_action[slots]
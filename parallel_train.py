@@ -0,0 +1,121 @@
+"""Train LearningAgents in many environments at once, in worker processes that share one Q-table.
+
+The Q values live in shared memory, and every worker's agent reads and updates them in place with
+no locking (Hogwild-style): the updates are small and sparse, so the occasional lost update is
+cheaper than synchronizing. Each worker drives its own seeded Environment and reports the outcome
+of every trip; training stops once the last `window` trips over all workers have succeeded, or
+after max_trips trips.
+
+Example: python parallel_train.py --workers 4 --seed 0 --checkpoint qtable.bin
+"""
+
+import time
+import Queue
+import random
+import logging
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from agent import LearningAgent
+from environment import Environment
+from qtable import QTable
+from simulator import Simulator
+from sweep import schedule
+from tripstats import TripStats
+
+
+def shared_qtable(values, visited):
+    """A QTable over shared-memory arrays (RawArrays of n_states * n_actions doubles and n_states bytes)."""
+    table = QTable(values=np.frombuffer(values, dtype=np.float64).reshape(QTable.n_states, QTable.n_actions))
+    table.visited = np.frombuffer(visited, dtype=np.bool_)
+    return table
+
+
+def worker(values, visited, seed, params, outcomes, stop):
+    """Run trials in a fresh environment, learning into the shared table, until stop is set.
+
+    Puts True (successful trip) or False into outcomes after every trial.
+    """
+    logging.disable(logging.INFO)  # quiet workers
+    seeds = random.Random(seed)
+    env = Environment(num_dummies=params['num_dummies'], seed=seeds.getrandbits(32))
+    agent = env.create_agent(LearningAgent, alpha=params['alpha'], gamma=params['gamma'], epsilon=params['epsilon'], seed=seeds.getrandbits(32))
+    agent.q_table = shared_qtable(values, visited)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    sim = Simulator(env, update_delay=0.0, display=False)
+    while not stop.is_set():
+        failures = agent.trip_stats.failures
+        sim.run(n_trials=1)
+        outcomes.put(agent.trip_stats.failures == failures)
+
+
+def train(n_workers, seed=0, max_trips=1000, window=10, alpha=0.5, gamma=0.05, epsilon='cutoff', num_dummies=12):
+    """Train with n_workers processes sharing one Q-table.
+
+    Return (QTable, result): a copy of the learned table, and a dict with the number of trips until
+    the last `window` trips all succeeded (None if that did not happen within max_trips), the total
+    number of trips and successful trips, and the elapsed seconds.
+    """
+    values = multiprocessing.RawArray('d', QTable.n_states * QTable.n_actions)
+    visited = multiprocessing.RawArray('b', QTable.n_states)
+    params = {'alpha': alpha, 'gamma': gamma, 'epsilon': epsilon, 'num_dummies': num_dummies}
+    outcomes = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    seeds = random.Random(seed)
+    workers = [multiprocessing.Process(target=worker, args=(values, visited, seeds.getrandbits(32), params, outcomes, stop))
+               for _ in xrange(n_workers)]
+
+    start_time = time.time()
+    for process in workers:
+        process.daemon = True
+        process.start()
+
+    # Follow the trips of all workers, in the order they finish
+    stats = TripStats(window=window)
+    converged_after = None
+    try:
+        while stats.count < max_trips:
+            stats.add(1.0 if outcomes.get() else 0)  # TripStats counts a trip as failed by deadline remaining 0
+            if stats.count >= window and stats.recent_failures() == 0:
+                converged_after = stats.count
+                break
+    finally:
+        elapsed = time.time() - start_time
+        stop.set()
+        while any(process.is_alive() for process in workers):  # keep draining, so no worker blocks on a full pipe
+            try:
+                outcomes.get(timeout=0.05)
+            except Queue.Empty:
+                pass
+        for process in workers:
+            process.join()
+
+    table = shared_qtable(values, visited)
+    result_table = QTable(values=table.values.copy())
+    result_table.visited = table.visited.copy()
+    return result_table, {'workers': n_workers, 'seed': seed, 'converged_after': converged_after, 'trips': stats.count,
+                          'successful_trips': stats.count - stats.failures, 'elapsed': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-trips', type=int, default=1000, help="stop after this many trips over all workers")
+    parser.add_argument('--alpha', type=schedule, default=0.5, help="constant or name from agent.alpha_schedules")
+    parser.add_argument('--gamma', type=float, default=0.05)
+    parser.add_argument('--epsilon', type=schedule, default='cutoff', help="constant or name from agent.epsilon_schedules")
+    parser.add_argument('--checkpoint', help="save the learned Q-table to this file (see checkpoint.py)")
+    args = parser.parse_args()
+
+    table, result = train(args.workers, seed=args.seed, max_trips=args.max_trips, alpha=args.alpha, gamma=args.gamma, epsilon=args.epsilon)
+    print "{workers} workers: converged after {converged_after} trips ({successful_trips} of {trips} trips successful, {elapsed:.2f} s)".format(**result)
+    if args.checkpoint:
+        import checkpoint
+        checkpoint.save_table(table, args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,70 @@
 import random
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def compute_waypoint(location, heading, destination):
+    """Work out the next waypoint with the planner's branch logic."""
+    delta = (destination[0] - location[0], destination[1] - location[1])
+    if delta[0] == 0 and delta[1] == 0:
+        return None
+    elif delta[0] != 0:  # EW difference
+        if delta[0] * heading[0] > 0:  # facing correct EW direction
+            return 'forward'
+        elif delta[0] * heading[0] < 0:  # facing opposite EW direction
+            return 'right'  # long U-turn
+        elif delta[0] * heading[1] > 0:
+            return 'left'
+        else:
+            return 'right'
+    elif delta[1] != 0:  # NS difference (turn logic is slightly different)
+        if delta[1] * heading[1] > 0:  # facing correct NS direction
+            return 'forward'
+        elif delta[1] * heading[1] < 0:  # facing opposite NS direction
+            return 'right'  # long U-turn
+        elif delta[1] * heading[0] > 0:
+            return 'right'
+        else:
+            return 'left'
+
+
+# The branch logic only depends on the heading and on the signs of the destination delta, so waypoint_table holds
+# every answer: waypoint_table[heading][sign_dx][sign_dy], filled in with compute_waypoint() itself. Signs index
+# the inner lists directly (-1 picks the last entry).
+
+waypoint_table = {}
+for heading in [(1, 0), (0, -1), (-1, 0), (0, 1)]:
+    waypoint_table[heading] = [[compute_waypoint((0, 0), heading, (sign_dx, sign_dy)) for sign_dy in (0, 1, -1)] for sign_dx in (0, 1, -1)]
+
 
 class RoutePlanner(object):
-    """Silly route planner that is meant for a perpendicular grid network."""
+    """Silly route planner that is meant for a perpendicular grid network.
+
+    With use_lookup (the default) next_waypoint() reads waypoint_table instead of running the branch
+    logic in compute_waypoint(); both give the same answers. The sign of any delta on the grid is
+    precomputed too, in a list indexed by the delta, whose length grows linearly with grid size.
+    Random destinations come from the planner's own stream, seeded with seed (drawn from the random
+    module when None).
+    """
 
-    def __init__(self, env, agent):
+    def __init__(self, env, agent, use_lookup=True, seed=None):
         self.env = env
         self.agent = agent
+        self.random = random.Random(seed if seed is not None else random.getrandbits(32))
         self.destination = None
+        self.use_lookup = use_lookup
+        max_delta = max(self.env.grid_size) - 1
+        self.sign = [0] + [1] * max_delta + [-1] * max_delta  # sign[delta] for -max_delta <= delta <= max_delta
 
     def route_to(self, destination=None):
-        self.destination = destination if destination is not None else random.choice(self.env.intersections.keys())
-        print "RoutePlanner.route_to(): destination = {}".format(destination)  # [debug]
+        self.destination = destination if destination is not None else self.random.choice(self.env.locations)
+        log.debug("RoutePlanner.route_to(): destination = %s", destination)
 
     def next_waypoint(self):
-        location = self.env.agent_states[self.agent]['location']
-        heading = self.env.agent_states[self.agent]['heading']
-        delta = (self.destination[0] - location[0], self.destination[1] - location[1])
-        if delta[0] == 0 and delta[1] == 0:
-            return None
-        elif delta[0] != 0:  # EW difference
-            if delta[0] * heading[0] > 0:  # facing correct EW direction
-                return 'forward'
-            elif delta[0] * heading[0] < 0:  # facing opposite EW direction
-                return 'right'  # long U-turn
-            elif delta[0] * heading[1] > 0:
-                return 'left'
-            else:
-                return 'right'
-        elif delta[1] != 0:  # NS difference (turn logic is slightly different)
-            if delta[1] * heading[1] > 0:  # facing correct NS direction
-                return 'forward'
-            elif delta[1] * heading[1] < 0:  # facing opposite NS direction
-                return 'right'  # long U-turn
-            elif delta[1] * heading[0] > 0:
-                return 'right'
-            else:
-                return 'left'
+        state = self.env.agent_states[self.agent]
+        location = state['location']
+        if not self.use_lookup:
+            return compute_waypoint(location, state['heading'], self.destination)
+        sign = self.sign
+        return waypoint_table[state['heading']][sign[self.destination[0] - location[0]]][sign[self.destination[1] - location[1]]]
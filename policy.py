@@ -0,0 +1,122 @@
+"""Inference-only driving policy over a frozen Q-table, answering batches of action queries.
+
+Run as a server: python policy.py CHECKPOINT [--port PORT]
+Each request is one line of JSON holding a list of queries, and each reply is one line holding the
+list of chosen actions. A query is either an object with 'light', 'oncoming', 'left', 'right' and
+'next' (the sensed inputs and the next waypoint) or an integer state index (see QTable.encode).
+A request that cannot be answered (malformed JSON, an unknown input value, a missing key or a state
+index out of range) gets the reply {"error": MESSAGE} instead, and the server carries on.
+Requests are read from stdin (replies go to stdout), or from TCP clients on localhost with --port.
+"""
+
+import sys
+import json
+import argparse
+import SocketServer
+
+import numpy as np
+
+from qtable import QTable
+
+
+class Policy(object):
+    """Greedy policy over a frozen Q-table.
+
+    Actions with the highest Q value in a state are chosen uniformly at random when there is more
+    than one, like LearningAgent does. Nothing is learned and nothing is logged.
+    """
+
+    def __init__(self, values, seed=None):
+        self.values = values
+        self.random = np.random.RandomState(seed)
+        self.best = values == values.max(axis=1)[:, None]  # best[state, action]: action has the highest Q value
+        self.n_best = self.best.sum(axis=1)
+        self.best_cumsum = self.best.cumsum(axis=1)
+
+    @classmethod
+    def from_checkpoint(cls, path, seed=None):
+        import checkpoint
+        table, _ = checkpoint.load(path, mmap=True)
+        return cls(table.values, seed=seed)
+
+    def act_states(self, states):
+        """Return the action codes (indices into QTable.actions) chosen for an array of state indices."""
+        states = np.asarray(states, dtype=int)
+        # Pick the k-th best action of each state, with k uniform over the number of tied best actions
+        k = (self.random.random_sample(len(states)) * self.n_best[states]).astype(int)
+        return (self.best_cumsum[states] > k[:, None]).argmax(axis=1)
+
+    def act(self, queries):
+        """Return the actions chosen for a list of queries (input dicts with 'next', or state indices).
+
+        Raises KeyError for an unknown input value or a missing key, IndexError for a state index out of range and
+        TypeError for anything else that is not a query.
+        """
+        if not isinstance(queries, list):
+            raise TypeError("a request is a list of queries, not {!r}".format(queries))
+        states = []
+        for query in queries:
+            if isinstance(query, dict):
+                states.append(QTable.encode(query, query['next']))
+            elif isinstance(query, (int, long)) and not isinstance(query, bool):
+                if not 0 <= query < QTable.n_states:
+                    raise IndexError("state index {} out of range 0-{}".format(query, QTable.n_states - 1))
+                states.append(query)
+            else:
+                raise TypeError("a query is an object of inputs or a state index, not {!r}".format(query))
+        return [QTable.actions[code] for code in self.act_states(states)]
+
+
+def answer(policy, line):
+    """Return the JSON reply to one request line, an error object if it cannot be answered."""
+    try:
+        return json.dumps(policy.act(json.loads(line)))
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        message = "unknown input value or missing key: {}".format(e) if isinstance(e, KeyError) else str(e)
+        return json.dumps({'error': message})
+
+
+def serve_lines(policy, infile, outfile):
+    """Answer one request per line until infile is exhausted."""
+    for line in iter(infile.readline, ''):
+        if line.strip():
+            outfile.write(answer(policy, line) + '\n')
+            outfile.flush()
+
+
+class PolicyHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        serve_lines(self.server.policy, self.rfile, self.wfile)
+
+
+class PolicyServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """TCP front end on localhost; each client connection is a stream of request lines."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, policy, port):
+        SocketServer.TCPServer.__init__(self, ('127.0.0.1', port), PolicyHandler)
+        self.policy = policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('checkpoint', help="Q-table checkpoint written by checkpoint.save()")
+    parser.add_argument('--port', type=int, help="serve TCP clients on this localhost port instead of stdin/stdout")
+    parser.add_argument('--seed', type=int, help="seed for breaking ties between equal Q values")
+    args = parser.parse_args()
+
+    policy = Policy.from_checkpoint(args.checkpoint, seed=args.seed)
+    if args.port is None:
+        serve_lines(policy, sys.stdin, sys.stdout)
+    else:
+        server = PolicyServer(policy, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
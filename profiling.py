@@ -0,0 +1,68 @@
+"""Opt-in per-phase profiling of Environment and Simulator.
+
+Attach a PhaseProfiler with env.enable_profiling(profiler); the Simulator driving that environment
+picks it up too. While no profiler is attached the instrumented code paths cost one attribute check
+per step.
+"""
+
+import functools
+from timeit import default_timer
+
+
+class PhaseProfiler(object):
+    """Cumulative time and call counts per named phase, for the current trial and for the whole run."""
+
+    def __init__(self, clock=default_timer):
+        self.clock = clock
+        self.current = {}  # phase -> [calls, seconds] in the current trial
+        self.totals = {}  # phase -> [calls, seconds] over finished trials
+        self.trials = []  # summary() of each finished trial
+
+    def add(self, phase, seconds, calls=1):
+        entry = self.current.get(phase)
+        if entry is None:
+            entry = self.current[phase] = [0, 0.0]
+        entry[0] += calls
+        entry[1] += seconds
+
+    def lap(self, phase, start):
+        """Charge the time since start to phase; return the current clock reading, to start the next lap."""
+        now = self.clock()
+        self.add(phase, now - start)
+        return now
+
+    def timed(self, phase, function):
+        """Wrap a function so that each call is charged to phase."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = self.clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(phase, self.clock() - start)
+        return wrapper
+
+    def end_trial(self):
+        """Close the current trial: record its summary and add it to the run totals."""
+        self.trials.append(self.summary(self.current))
+        for phase, (calls, seconds) in self.current.iteritems():
+            entry = self.totals.setdefault(phase, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        self.current = {}
+
+    def run_summary(self):
+        return self.summary(self.totals)
+
+    @staticmethod
+    def summary(phases):
+        return {phase: {'calls': calls, 'seconds': seconds, 'us_per_call': seconds * 1e6 / calls if calls else 0.0}
+                for phase, (calls, seconds) in phases.iteritems()}
+
+    def report(self, summary=None):
+        """Format a summary (default: the whole run) as a table, slowest phase first."""
+        summary = summary if summary is not None else self.run_summary()
+        lines = ["{:<36}  {:>10}  {:>10}  {:>10}".format("phase", "calls", "seconds", "us/call")]
+        for phase, values in sorted(summary.iteritems(), key=lambda item: -item[1]['seconds']):
+            lines.append("{:<36}  {:>10}  {:>10.4f}  {:>10.2f}".format(phase, values['calls'], values['seconds'], values['us_per_call']))
+        return '\n'.join(lines)
@@ -0,0 +1,98 @@
+import random
+import numpy as np
+
+from environment import Environment
+
+
+class QTable(object):
+    """A dense Q-table over the smartcab's sensed states.
+
+    A state packs light, left, right, oncoming and next waypoint into one integer index
+    (2 x 4 x 4 x 4 x 4 = 512 states), and values[state, action] holds the Q value of each
+    action, with columns in Environment.valid_actions order.
+    """
+
+    actions = Environment.valid_actions  # [None, 'forward', 'left', 'right']
+    action_index = {action: i for i, action in enumerate(actions)}
+    lights = ['red', 'green']
+    light_index = {light: i for i, light in enumerate(lights)}
+    n_states = len(lights) * len(actions) ** 4
+    n_actions = len(actions)
+
+    def __init__(self, values=None):
+        self.values = np.zeros((self.n_states, self.n_actions)) if values is None else values
+        self.visited = np.zeros(self.n_states, dtype=bool)  # states seen so far, for to_dict()
+
+    @classmethod
+    def encode(cls, inputs, next_waypoint):
+        """Pack sensed inputs and the next waypoint into a state index."""
+        action_index = cls.action_index
+        return ((((cls.light_index[inputs['light']] * 4 + action_index[inputs['left']]) * 4
+                  + action_index[inputs['right']]) * 4 + action_index[inputs['oncoming']]) * 4
+                + action_index[next_waypoint])
+
+    @classmethod
+    def decode(cls, state):
+        """Unpack a state index into the tuple form used by LearningAgent before the table was array-backed."""
+        state, next_waypoint = divmod(state, 4)
+        state, oncoming = divmod(state, 4)
+        state, right = divmod(state, 4)
+        light, left = divmod(state, 4)
+        return (('light', cls.lights[light]), ('left', cls.actions[left]), ('right', cls.actions[right]),
+                ('oncoming', cls.actions[oncoming]), ('next', cls.actions[next_waypoint]))
+
+    def visit(self, state):
+        self.visited[state] = True
+
+    def best_action(self, state, rng=random):
+        """Return the action with the highest Q value in a state, breaking ties at random (drawing from rng)."""
+        row = self.values[state].tolist()  # a snapshot, so this holds even while other processes update a shared table
+        best_value = max(row)
+        best = [action for action, value in enumerate(row) if value == best_value]
+        return self.actions[best[0] if len(best) == 1 else rng.choice(best)]
+
+    def update_batch(self, states, actions, rewards, next_states, next_actions, alpha, gamma):
+        """Apply LearningAgent's update rule to arrays of transitions (actions as codes) in one vectorized pass.
+
+        Targets are taken from the values before the batch. Where a (state, action) pair occurs more than once, its
+        updates are applied in batch order, each one decaying the ones before it by (1 - alpha).
+        """
+        if len(states) == 0:
+            return
+        values = self.values
+        targets = np.asarray(rewards + gamma * values[next_states, next_actions], dtype=float)
+        keys = np.asarray(states) * self.n_actions + actions
+        order = np.argsort(keys, kind='mergesort')  # stable, so each pair's updates stay in batch order
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, len(keys)))
+        # The j-th of a pair's k updates ends up weighted alpha * (1 - alpha) ** (k - 1 - j)
+        later = np.repeat(starts + counts, counts) - 1 - np.arange(len(keys))
+        pairs = keys[starts]
+        values.flat[pairs] = (1 - alpha) ** counts * values.flat[pairs] + np.add.reduceat(alpha * (1 - alpha) ** later * targets[order], starts)
+
+    def get(self, state, action):
+        return self.values[state, self.action_index[action]]
+
+    def set(self, state, action, value):
+        self.values[state, self.action_index[action]] = value
+
+    def to_dict(self):
+        """Return the visited states as {state tuple: {action: Q value}}."""
+        return {self.decode(state): dict(zip(self.actions, self.values[state].tolist()))
+                for state in np.flatnonzero(self.visited)}
+
+    @classmethod
+    def from_dict(cls, q_table):
+        """Build a table from {state tuple: {action: Q value}}, with state tuples as produced by decode()."""
+        table = cls()
+        for state, action_values in q_table.iteritems():
+            state = dict(state)
+            index = cls.encode(state, state['next'])
+            table.visit(index)
+            for action, value in action_values.iteritems():
+                table.set(index, action, value)
+        return table
+
+    def __repr__(self):
+        return repr(self.to_dict())
@@ -0,0 +1,170 @@
+"""Compact trial recordings that replay exactly, headless.
+
+Each Environment trial draws from its own seeded stream (see Environment.reset()), so a trial is
+fully determined by its seed, by the state earlier trials left behind (traffic light states and the
+waypoints that the dummies and the primary agent show) and by the primary agent's actions. A recording is a JSON-lines file: a
+header with the environment's configuration, then one line per trial with exactly that, actions
+coded as a string of digits indexing Environment.valid_actions. Replaying a trial feeds its actions
+back to a ReplayAgent in an environment built the same way, without the learning agent, e.g. to
+profile a slow trial or to rerun a failing one:
+
+    python recording.py RECORDING --trial 42 --profile
+"""
+
+import json
+import time
+import logging
+import argparse
+
+from environment import Agent, DummyAgent, Environment
+from planner import RoutePlanner
+from rules import RuleSet
+
+VERSION = 1
+
+
+def _waypoints(env):
+    """Waypoint codes shown by the primary agent and the dummies (DummyAgents in order, then the DummyTraffic engine's)."""
+    codes = [Environment.valid_actions.index(agent.get_next_waypoint()) for agent in env.agent_states
+             if agent is env.primary_agent or isinstance(agent, DummyAgent)]
+    if env.dummy_traffic is not None:
+        codes.extend(env.dummy_traffic.waypoint.tolist())
+    return codes
+
+
+class TrialRecorder(object):
+    """Records every trial of an environment (whose primary agent is set) to a recording file."""
+
+    def __init__(self, env, path):
+        self.file = open(path, 'w')
+        self.file.write(json.dumps({'version': VERSION, 'seed': env.seed, 'num_dummies': env.num_dummies, 'grid_size': env.grid_size,
+                                    'vectorized_dummies': env.dummy_traffic is not None, 'enforce_deadline': env.enforce_deadline,
+                                    'rules': env.rules.settings()}) + '\n')
+        self.trial = None
+        self.trials = 0
+        env.observers.append(self)
+
+    def trial_started(self, env):
+        self.flush()
+        lights = ''.join('1' if env.light_state(cell) else '0' for cell in xrange(len(env.lights)))
+        self.trial = {'trial': self.trials, 'seed': env.trial_seed, 'lights': '{:x}'.format(int(lights, 2)),  # one bit per cell
+                      'waypoints': ''.join(str(code) for code in _waypoints(env)), 'steps': 0, 'reward': 0.0}
+        self.actions = []
+        self.trials += 1
+
+    def primary_acted(self, env, action, reward):
+        self.actions.append(Environment.valid_actions.index(action))
+        self.trial['steps'] += 1
+        self.trial['reward'] += reward
+
+    def flush(self):
+        """Write out the trial in progress (it is complete once the next trial starts)."""
+        if self.trial is not None:
+            self.trial['actions'] = ''.join(str(code) for code in self.actions)
+            self.file.write(json.dumps(self.trial) + '\n')
+            self.file.flush()
+            self.trial = None
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_recording(path):
+    """Return (header, list of trial records) from a recording file."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get('version') != VERSION:
+            raise ValueError("{} is not a version {} trial recording".format(path, VERSION))
+        return header, [json.loads(line) for line in f]
+
+
+class ReplayAgent(Agent):
+    """Primary agent that takes the actions of a recorded trial, following the route planner like LearningAgent does."""
+
+    def __init__(self, env):
+        super(ReplayAgent, self).__init__(env)
+        self.color = 'red'
+        self.planner = RoutePlanner(self.env, self)
+        self.actions = iter(())  # action codes
+        self.steps = 0
+        self.reward = 0.0
+
+    def reset(self, destination=None):
+        self.planner.route_to(destination)
+        self.steps = 0
+        self.reward = 0.0
+
+    def update(self, t):
+        self.next_waypoint = self.planner.next_waypoint()  # other agents sense it
+        self.reward += self.env.act(self, Environment.valid_actions[next(self.actions)])
+        self.steps += 1
+
+
+def replay_environment(header):
+    """Build an environment (with a ReplayAgent as primary agent) the way the recorded one was built."""
+    env = Environment(num_dummies=header['num_dummies'], grid_size=header['grid_size'],
+                      vectorized_dummies=header['vectorized_dummies'], seed=header['seed'], rules=RuleSet(**header.get('rules', {})))
+    agent = env.create_agent(ReplayAgent)
+    env.set_primary_agent(agent, enforce_deadline=header['enforce_deadline'])
+    return env
+
+
+def replay(env, record):
+    """Replay a recorded trial in an environment from replay_environment(); return (steps, total reward)."""
+    env.reset(seed=record['seed'])
+
+    # Restore the state the trial started from
+    lights = [bit == '1' for bit in bin(int(record['lights'], 16))[2:].zfill(len(env.lights))]
+    for light, state in zip(env.lights, lights):
+        light.start_state = state  # lights are recorded at time 0 of the trial
+        light.epoch = env.light_epoch
+    waypoints = [int(code) for code in record['waypoints']]
+    agents = [agent for agent in env.agent_states if agent is env.primary_agent or isinstance(agent, DummyAgent)]
+    for agent, code in zip(agents, waypoints):
+        agent.next_waypoint = Environment.valid_actions[code]
+    if env.dummy_traffic is not None:
+        env.dummy_traffic.waypoint[:] = waypoints[len(agents):]
+        env.dummy_traffic.light_state[:] = lights
+        env.dummy_traffic.light_epoch = env.light_epoch
+
+    env.primary_agent.actions = (int(code) for code in record['actions'])
+    while not env.done:
+        env.step()
+    return env.primary_agent.steps, env.primary_agent.reward
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording', help="file written by TrialRecorder")
+    parser.add_argument('--trial', type=int, nargs='+', help="trials to replay (default: all)")
+    parser.add_argument('--profile', action='store_true', help="report time per phase of each replayed trial")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    header, records = read_recording(args.recording)
+    env = replay_environment(header)
+    if args.profile:
+        from profiling import PhaseProfiler
+        env.enable_profiling(PhaseProfiler())
+
+    for record in records if args.trial is None else [records[k] for k in args.trial]:
+        start_time = time.time()
+        steps, reward = replay(env, record)
+        elapsed = time.time() - start_time
+        exact = steps == record['steps'] and reward == record['reward']
+        print "trial {}: {} steps, reward {}, {:.4f} s ({})".format(record['trial'], steps, reward, elapsed, "exact" if exact else "DIVERGED from recording")
+        if env.profiler is not None:
+            env.profiler.end_trial()
+            print env.profiler.report(env.profiler.trials[-1])
+
+
+if __name__ == '__main__':
+    main()
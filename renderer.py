@@ -0,0 +1,211 @@
+"""Incremental PyGame renderer for Simulator.
+
+A full redraw of the grid every frame (every road, intersection, light and agent) cannot keep up on
+larger grids. Renderer instead draws:
+
+* the static layer (background, roads and intersections) once, onto a cached surface;
+* sprites rotated once per colour and heading, and waypoint labels rendered once per (text, colour);
+* each frame, only the items (lights, agents, destinations, status text) whose appearance changed,
+  together with whatever they overlap, restoring the static layer underneath first. Only those
+  rectangles are sent to the display.
+
+The result is pixel for pixel what a full redraw would give. It runs headless with SDL's dummy video
+driver (SDL_VIDEODRIVER=dummy), e.g. to test or time it.
+"""
+
+import os
+
+
+class Renderer(object):
+    """Draws sim.env onto sim.screen with sim.pygame, using the Simulator's colours, sizes and font."""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.env = sim.env
+        self.pygame = sim.pygame
+        self.screen = sim.screen
+        self.font = sim.font
+        self.static_layer = None
+        self.light_items = None  # (item id, center, rect) by cell
+        self.sprites = {}  # colour -> sprites by heading index (see Environment.valid_headings)
+        self.labels = {}  # (text, colour) -> rendered text
+        self.drawn = None  # item id -> (appearance, rect) as last drawn; None forces a full redraw
+        self.frames = 0
+        self.pixels_updated = 0
+
+    def invalidate(self):
+        """Redraw everything on the next frame (e.g. after something else drew on the screen)."""
+        self.drawn = None
+
+    def render(self):
+        items = self.items()
+        if self.drawn is None:
+            self.screen.blit(self.get_static_layer(), (0, 0))
+            for _, _, _, draw, args in items:
+                draw(*args)
+            self.pygame.display.flip()
+            self.pixels_updated += self.sim.width * self.sim.height
+        else:
+            dirty = self.redraw(items)
+            self.pygame.display.update(dirty)
+            self.pixels_updated += sum(rect.width * rect.height for rect in dirty)
+        self.drawn = {item_id: (appearance, rect) for item_id, appearance, rect, _, _ in items}
+        self.frames += 1
+
+    def redraw(self, items):
+        """Redraw the items that changed since the last frame, and those they overlap; return the dirty rectangles."""
+        drawn = self.drawn
+        dirty = []
+        redrawn = [False] * len(items)
+        current = set()
+        for i, (item_id, appearance, rect, _, _) in enumerate(items):
+            current.add(item_id)
+            previous = drawn.get(item_id)
+            if previous is None or previous[0] != appearance or previous[1] != rect:
+                redrawn[i] = True
+                dirty.append(rect)
+                if previous is not None and previous[1] != rect:
+                    dirty.append(previous[1])  # to erase
+        if len(current) < len(drawn):
+            dirty.extend(rect for item_id, (_, rect) in drawn.iteritems() if item_id not in current)
+        if not dirty:
+            return dirty
+
+        # Items overlapping a dirty rectangle are redrawn whole, so their rectangles become dirty too
+        # (until no more are caught): blending a sprite twice over itself would not give the same pixels
+        rects = [rect for _, _, rect, _, _ in items]
+        unchecked = list(dirty)
+        while unchecked:
+            for i in unchecked.pop().collidelistall(rects):
+                if not redrawn[i]:
+                    redrawn[i] = True
+                    dirty.append(rects[i])
+                    unchecked.append(rects[i])
+
+        static_layer = self.get_static_layer()
+        for rect in dirty:
+            self.screen.blit(static_layer, rect, rect)
+        for i, (_, _, _, draw, args) in enumerate(items):
+            if redrawn[i]:
+                draw(*args)
+        return dirty
+
+    def items(self):
+        """What to draw this frame, bottom to top: (item id, appearance, bounding rect, draw function, arguments)."""
+        env = self.env
+        sim = self.sim
+        pygame = self.pygame
+        Rect = pygame.Rect
+        block_size = env.block_size
+        radius = sim.agent_circle_radius
+        items = []
+
+        # Lights: a green bar across the open direction of each intersection
+        if self.light_items is None:
+            self.light_items = [(('light', cell), (x * block_size, y * block_size), Rect(x * block_size - 18, y * block_size - 18, 37, 37))
+                                for cell, (x, y) in enumerate(env.locations)]
+        draw_light = self.draw_light
+        light_state = env.light_state
+        for cell, (item_id, center, rect) in enumerate(self.light_items):
+            north_south = light_state(cell)
+            items.append((item_id, north_south, rect, draw_light, (center, north_south)))
+
+        for agent, state in env.agent_states.iteritems():
+            # Back from the intersection some
+            heading = state['heading']
+            location = (state['location'][0] * block_size, state['location'][1] * block_size)
+            agent_pos = (location[0] - 2 * heading[0] * radius, location[1] - 2 * heading[1] * radius)
+            sprites = self.get_sprites(agent.color)
+            if sprites is not None:
+                sprite = sprites[env.heading_index[heading]]
+                rect = sprite.get_rect(center=agent_pos)
+            else:
+                sprite = None
+                rect = Rect(agent_pos[0] - radius, agent_pos[1] - radius, 2 * radius + 1, 2 * radius + 1).union(self.line_rect(agent_pos, location))
+            label = agent.get_next_waypoint()
+            if label is not None:
+                text = self.get_label(label, agent.color)
+                rect = rect.union(text.get_rect(topleft=(agent_pos[0] + 10, agent_pos[1] + 10)))
+            else:
+                text = None
+            items.append((('agent', id(agent)), (agent.color, agent_pos, heading, label), rect, self.draw_agent,
+                          (agent.color, agent_pos, location, sprite, text)))
+            if state['destination'] is not None:
+                destination = (state['destination'][0] * block_size, state['destination'][1] * block_size)
+                items.append((('destination', id(agent)), (agent.color, destination), Rect(destination[0] - 16, destination[1] - 16, 33, 33),
+                              self.draw_destination, (agent.color, destination)))
+
+        traffic = env.dummy_traffic
+        if traffic is not None:  # vectorized dummies, drawn as simple agents
+            for i, (x, y, h) in enumerate(zip(traffic.x.tolist(), traffic.y.tolist(), traffic.heading.tolist())):
+                heading = env.valid_headings[h]
+                location = (x * block_size, y * block_size)
+                agent_pos = (location[0] - 2 * heading[0] * radius, location[1] - 2 * heading[1] * radius)
+                rect = Rect(agent_pos[0] - radius, agent_pos[1] - radius, 2 * radius + 1, 2 * radius + 1).union(self.line_rect(agent_pos, location))
+                items.append((('dummy', i), agent_pos, rect, self.draw_agent, ('blue', agent_pos, location, None, None)))
+
+        # Overlays
+        text_y = 10
+        for i, line in enumerate(env.status_text.split('\n')):
+            text = self.font.render(line, True, self.sim.colors['red'], self.sim.bg_color)  # not cached: changes every step
+            items.append((('status', i), line, text.get_rect(topleft=(100, text_y)), self.screen.blit, (text, (100, text_y))))
+            text_y += 20
+        return items
+
+    def line_rect(self, start, end):
+        """Bounding rect of a road-width line from start to end."""
+        margin = self.sim.road_width
+        return self.pygame.Rect(min(start[0], end[0]) - margin, min(start[1], end[1]) - margin,
+                                abs(end[0] - start[0]) + 2 * margin + 1, abs(end[1] - start[1]) + 2 * margin + 1)
+
+    def draw_light(self, center, north_south):
+        x, y = center
+        if north_south:  # North-South is open
+            self.pygame.draw.line(self.screen, self.sim.colors['green'], (x, y - 15), (x, y + 15), self.sim.road_width)
+        else:  # East-West is open
+            self.pygame.draw.line(self.screen, self.sim.colors['green'], (x - 15, y), (x + 15, y), self.sim.road_width)
+
+    def draw_agent(self, color, agent_pos, location, sprite, text):
+        if sprite is not None:
+            self.screen.blit(sprite, sprite.get_rect(center=agent_pos))
+        else:
+            # Simple agent: a circle with a short line segment poking out to indicate heading
+            self.pygame.draw.circle(self.screen, self.sim.colors[color], agent_pos, self.sim.agent_circle_radius)
+            self.pygame.draw.line(self.screen, self.sim.colors[color], agent_pos, location, self.sim.road_width)
+        if text is not None:
+            self.screen.blit(text, (agent_pos[0] + 10, agent_pos[1] + 10))
+
+    def draw_destination(self, color, destination):
+        self.pygame.draw.circle(self.screen, self.sim.colors[color], destination, 6)
+        self.pygame.draw.circle(self.screen, self.sim.colors[color], destination, 15, 2)
+
+    def get_static_layer(self):
+        if self.static_layer is None:
+            layer = self.screen.copy()  # same pixel format
+            layer.fill(self.sim.bg_color)
+            block_size = self.env.block_size
+            for a, b in self.env.roads:
+                self.pygame.draw.line(layer, self.sim.road_color, (a[0] * block_size, a[1] * block_size), (b[0] * block_size, b[1] * block_size), self.sim.road_width)
+            for x, y in self.env.locations:
+                self.pygame.draw.circle(layer, self.sim.road_color, (x * block_size, y * block_size), 10)
+            self.static_layer = layer
+        return self.static_layer
+
+    def get_sprites(self, color):
+        """The car image for color, scaled and rotated to each heading; None if there is no image for color."""
+        if color not in self.sprites:
+            path = os.path.join("images", "car-{}.png".format(color))
+            if os.path.exists(path):
+                sprite = self.pygame.transform.smoothscale(self.pygame.image.load(path), self.sim.agent_sprite_size)
+                # The image faces East; rotate counter-clockwise for North, West and South
+                self.sprites[color] = [sprite, self.pygame.transform.rotate(sprite, 90),
+                                       self.pygame.transform.rotate(sprite, 180), self.pygame.transform.rotate(sprite, -90)]
+            else:
+                self.sprites[color] = None
+        return self.sprites[color]
+
+    def get_label(self, text, color):
+        label = self.labels.get((text, color))
+        if label is None:
+            label = self.labels[(text, color)] = self.font.render(text, True, self.sim.colors[color], self.sim.bg_color)
+        return label
@@ -0,0 +1,73 @@
+"""Traffic rules and rewards for Environment.act(), as data compiled into a lookup table.
+
+A RuleSet says which moves are legal (from the light and the oncoming and left traffic) and what
+each outcome earns. It compiles every combination once into outcomes, a dict from
+(light, oncoming, left, action, on route) to (turn, reward), so that act() settles a move with a
+single lookup. on route is whether a non-null action follows the agent's next waypoint; turn is
+the change of heading index (0 forward, 1 left, 3 right; see Environment.valid_headings) of a
+legal move, or None when the agent stays put.
+
+Variants of the rules are data: pass Environment(rules=...) a RuleSet or a name from rule_sets.
+"""
+
+import itertools
+
+actions = [None, 'forward', 'left', 'right']  # Environment.valid_actions
+lights = ['green', 'red']
+turns = {'forward': 0, 'left': 1, 'right': 3}
+
+
+class RuleSet(object):
+    """Legality of moves and rewards, with the default values of the original smartcab rules."""
+
+    def __init__(self, on_route_reward=2.0, off_route_reward=-0.5, idle_reward=0.0, violation_reward=-1.0,
+                 arrival_bonus=10, right_on_red=True):
+        self.on_route_reward = on_route_reward  # legal move that follows the waypoint
+        self.off_route_reward = off_route_reward  # legal move that does not
+        self.idle_reward = idle_reward  # null action
+        self.violation_reward = violation_reward  # illegal move (the agent stays put)
+        self.arrival_bonus = arrival_bonus  # added when the primary agent arrives within its deadline
+        self.right_on_red = right_on_red  # right turns on red, unless traffic from the left goes forward
+        self.outcomes = self.compile()
+
+    def settings(self):
+        """Keyword arguments that rebuild this RuleSet (e.g. to record it)."""
+        return {'on_route_reward': self.on_route_reward, 'off_route_reward': self.off_route_reward, 'idle_reward': self.idle_reward,
+                'violation_reward': self.violation_reward, 'arrival_bonus': self.arrival_bonus, 'right_on_red': self.right_on_red}
+
+    def legal(self, light, oncoming, left, action):
+        """Whether action is a legal move; the right-hand traffic never matters."""
+        if action == 'forward':
+            return light == 'green'
+        elif action == 'left':
+            return light == 'green' and (oncoming is None or oncoming == 'left')
+        elif action == 'right':
+            return light == 'green' or (self.right_on_red and left != 'forward')
+        return True
+
+    def outcome(self, light, oncoming, left, action, on_route):
+        """(turn, reward) of action, as described in the module docstring."""
+        if action is None:
+            return None, self.idle_reward
+        if not self.legal(light, oncoming, left, action):
+            return None, self.violation_reward
+        return turns[action], self.on_route_reward if on_route else self.off_route_reward
+
+    def compile(self):
+        return {key: self.outcome(*key) for key in itertools.product(lights, actions, actions, actions, [False, True])}
+
+
+rule_sets = {
+    'default': RuleSet(),
+    'no right on red': RuleSet(right_on_red=False),
+    'strict': RuleSet(violation_reward=-5.0, off_route_reward=-1.0),
+}
+
+
+def get_rules(rules):
+    """Return a RuleSet for a name in rule_sets, a RuleSet, or None (the default rules)."""
+    if rules is None:
+        return rule_sets['default']
+    if isinstance(rules, basestring):
+        return rule_sets[rules]
+    return rules
@@ -1,7 +1,9 @@
-import os
 import time
-import random
+import logging
 import importlib
+from collections import deque
+
+log = logging.getLogger(__name__)
 
 class Simulator(object):
     """Simulates agents in a dynamic smartcab environment.
@@ -21,7 +23,7 @@ class Simulator(object):
         'orange'  : (255, 128,   0)
     }
 
-    def __init__(self, env, size=None, update_delay=1.0, display=True):
+    def __init__(self, env, size=None, update_delay=1.0, display=True, frame_skip=0):
         self.env = env
         self.size = size if size is not None else ((self.env.grid_size[0] + 1) * self.env.block_size, (self.env.grid_size[1] + 1) * self.env.block_size)
         self.width, self.height = self.size
@@ -35,6 +37,7 @@ class Simulator(object):
         self.current_time = 0.0
         self.last_updated = 0.0
         self.update_delay = update_delay  # duration between each step (in secs)
+        self.frame_skip = frame_skip  # environment steps to run between rendered frames, without drawing them
 
         self.display = display
         if self.display:
@@ -46,32 +49,48 @@ class Simulator(object):
                 self.frame_delay = max(1, int(self.update_delay * 1000))  # delay between GUI frames in ms (min: 1)
                 self.agent_sprite_size = (32, 32)
                 self.agent_circle_radius = 10  # radius of circle, when using simple representation
-                for agent in self.env.agent_states:
-                    agent._sprite = self.pygame.transform.smoothscale(self.pygame.image.load(os.path.join("images", "car-{}.png".format(agent.color))), self.agent_sprite_size)
-                    agent._sprite_size = (agent._sprite.get_width(), agent._sprite.get_height())
-
                 self.font = self.pygame.font.Font(None, 28)
                 self.paused = False
+                from renderer import Renderer
+                self.renderer = Renderer(self)  # caches the static layer and sprites, redraws only what changed
             except ImportError as e:
                 self.display = False
-                print "Simulator.__init__(): Unable to import pygame; display disabled.\n{}: {}".format(e.__class__.__name__, e)
+                log.warning("Simulator.__init__(): Unable to import pygame; display disabled.\n%s: %s", e.__class__.__name__, e)
             except Exception as e:
                 self.display = False
-                print "Simulator.__init__(): Error initializing GUI objects; display disabled.\n{}: {}".format(e.__class__.__name__, e)
+                log.warning("Simulator.__init__(): Error initializing GUI objects; display disabled.\n%s: %s", e.__class__.__name__, e)
+
+    def run(self, n_trials=1, checkpoint_path=None, checkpoint_every=10, monitor=None):
+        """Run trials; with checkpoint_path, save the primary agent every checkpoint_every trials and at the end.
+
+        With a monitor (see convergence.py), stop early once it reports convergence after a trial.
+        """
+        if not self.display and self.update_delay <= 0:
+            self.run_headless(n_trials, checkpoint_path, checkpoint_every, monitor)  # nothing to pace or draw
+            return
 
-    def run(self, n_trials=1):
         self.quit = False
+        self.reset_run_stats()
+        profiler = self.env.profiler  # see Environment.enable_profiling()
         for trial in xrange(n_trials):
-            print "Simulator.run(): Trial {}".format(trial)  # [debug]
-            self.env.reset()
+            log.info("Simulator.run(): Trial %s", trial)
+            try:
+                self.env.reset()
+            except KeyboardInterrupt:
+                self.quit = True  # the trial never started, so there is nothing to end
+                break
             self.current_time = 0.0
             self.last_updated = 0.0
             self.start_time = time.time()
+            self.steps_since_render = self.frame_skip + 1  # draw the trial's first frame
+            steps = 0
             while True:
                 try:
                     # Update current time
                     self.current_time = time.time() - self.start_time
                     #print "Simulator.run(): current_time = {:.3f}".format(self.current_time)
+                    if profiler is not None:
+                        start = profiler.clock()
 
                     # Handle GUI events
                     if self.display:
@@ -86,15 +105,25 @@ class Simulator(object):
 
                         if self.paused:
                             self.pause()
+                        if profiler is not None:
+                            start = profiler.lap('simulator.events', start)
 
                     # Update environment
                     if self.current_time - self.last_updated >= self.update_delay:
                         self.env.step()
                         self.last_updated = self.current_time
+                        self.steps_since_render += 1
+                        steps += 1
+                        if profiler is not None:
+                            start = profiler.lap('simulator.step', start)
 
                     # Render GUI and sleep
                     if self.display:
-                        self.render()
+                        if self.steps_since_render > self.frame_skip or self.env.done:
+                            self.render()
+                            self.steps_since_render = 0
+                            if profiler is not None:
+                                start = profiler.lap('simulator.render', start)
                         self.pygame.time.wait(self.frame_delay)
                 except KeyboardInterrupt:
                     self.quit = True
@@ -102,70 +131,95 @@ class Simulator(object):
                     if self.quit or self.env.done:
                         break
 
-            if self.quit:
+            self.end_trial(trial, n_trials, steps, checkpoint_path, checkpoint_every, monitor)
+            if self.quit or self.converged:
                 break
 
+    def run_headless(self, n_trials=1, checkpoint_path=None, checkpoint_every=10, monitor=None):
+        """Run trials with env.step() called back to back: no display, no pacing and no per-step clock reads.
+
+        Steps and steps per second of each trial are recorded in self.trial_stats.
+        """
+        self.quit = False
+        self.reset_run_stats()
+        self.trial_stats = []
+        env = self.env
+        profiler = env.profiler  # see Environment.enable_profiling()
+        trial_open = False  # whether the current trial has started and has not been ended yet
+        try:
+            for trial in xrange(n_trials):
+                log.info("Simulator.run_headless(): Trial %s", trial)
+                env.reset()
+                steps = 0
+                trial_open = True
+                start_time = time.time()
+                if profiler is None:
+                    while not env.done:
+                        env.step()
+                        steps += 1
+                else:
+                    while not env.done:
+                        start = profiler.clock()
+                        env.step()
+                        profiler.lap('simulator.step', start)
+                        steps += 1
+                elapsed = time.time() - start_time
+                steps_per_sec = steps / elapsed if elapsed > 0 else float('inf')
+                self.trial_stats.append({'trial': trial, 'steps': steps, 'elapsed': elapsed, 'steps_per_sec': steps_per_sec})
+                log.info("Simulator.run_headless(): Trial %s took %s steps (%.1f steps/sec)", trial, steps, steps_per_sec)
+                trial_open = False
+                self.end_trial(trial, n_trials, steps, checkpoint_path, checkpoint_every, monitor)
+                if self.converged:
+                    break
+        except KeyboardInterrupt:
+            self.quit = True
+            if trial_open:  # interrupted during a step, not during a reset or after the trial ended
+                self.end_trial(trial, n_trials, steps, checkpoint_path, checkpoint_every)
+
+    def reset_run_stats(self):
+        self.trials_run = 0
+        self.steps_run = 0
+        self.recent_trial_steps = deque(maxlen=10)  # for the estimate of steps saved
+        self.converged = False
+        self.steps_saved = 0
+
+    def end_trial(self, trial, n_trials, steps, checkpoint_path=None, checkpoint_every=10, monitor=None):
+        """Count the trial's steps (env.t misses the step on which the primary agent arrives), close its profile, if
+        profiling, ask monitor whether training has converged, and checkpoint the primary agent if one is due after
+        this trial (or the run is ending)."""
+        self.trials_run += 1
+        self.steps_run += steps
+        self.recent_trial_steps.append(steps)
+        if monitor is not None and not self.quit and trial < n_trials - 1 and monitor.converged(self.env):
+            self.converged = True
+            self.steps_saved = int(round((n_trials - trial - 1) * sum(self.recent_trial_steps) / float(len(self.recent_trial_steps))))
+            log.info("Simulator.end_trial(): Converged after %s of %s trials (%s steps); about %s steps saved",
+                     trial + 1, n_trials, self.steps_run, self.steps_saved)
+        if self.env.profiler is not None:
+            self.env.profiler.end_trial()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Simulator.end_trial(): Profile of trial %s:\n%s", trial, self.env.profiler.report(self.env.profiler.trials[-1]))
+        if checkpoint_path is None or self.env.primary_agent is None:
+            return
+        if (trial + 1) % checkpoint_every == 0 or trial == n_trials - 1 or self.quit or self.converged:
+            import checkpoint  # only needed (with NumPy) when checkpointing
+            checkpoint.save(self.env.primary_agent, checkpoint_path)
+            log.info("Simulator.end_trial(): Saved checkpoint after trial %s to %s", trial, checkpoint_path)
+
     def render(self):
-        # Clear screen
-        self.screen.fill(self.bg_color)
-
-        # Draw elements
-        # * Static elements
-        for road in self.env.roads:
-            self.pygame.draw.line(self.screen, self.road_color, (road[0][0] * self.env.block_size, road[0][1] * self.env.block_size), (road[1][0] * self.env.block_size, road[1][1] * self.env.block_size), self.road_width)
-
-        for intersection, traffic_light in self.env.intersections.iteritems():
-            self.pygame.draw.circle(self.screen, self.road_color, (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size), 10)
-            if traffic_light.state:  # North-South is open
-                self.pygame.draw.line(self.screen, self.colors['green'],
-                    (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size - 15),
-                    (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size + 15), self.road_width)
-            else:  # East-West is open
-                self.pygame.draw.line(self.screen, self.colors['green'],
-                    (intersection[0] * self.env.block_size - 15, intersection[1] * self.env.block_size),
-                    (intersection[0] * self.env.block_size + 15, intersection[1] * self.env.block_size), self.road_width)
-
-        # * Dynamic elements
-        for agent, state in self.env.agent_states.iteritems():
-            # Compute precise agent location here (back from the intersection some)
-            agent_offset = (2 * state['heading'][0] * self.agent_circle_radius, 2 * state['heading'][1] * self.agent_circle_radius)
-            agent_pos = (state['location'][0] * self.env.block_size - agent_offset[0], state['location'][1] * self.env.block_size - agent_offset[1])
-            agent_color = self.colors[agent.color]
-            if hasattr(agent, '_sprite') and agent._sprite is not None:
-                # Draw agent sprite (image), properly rotated
-                rotated_sprite = agent._sprite if state['heading'] == (1, 0) else self.pygame.transform.rotate(agent._sprite, 180 if state['heading'][0] == -1 else state['heading'][1] * -90)
-                self.screen.blit(rotated_sprite,
-                    self.pygame.rect.Rect(agent_pos[0] - agent._sprite_size[0] / 2, agent_pos[1] - agent._sprite_size[1] / 2,
-                        agent._sprite_size[0], agent._sprite_size[1]))
-            else:
-                # Draw simple agent (circle with a short line segment poking out to indicate heading)
-                self.pygame.draw.circle(self.screen, agent_color, agent_pos, self.agent_circle_radius)
-                self.pygame.draw.line(self.screen, agent_color, agent_pos, state['location'], self.road_width)
-            if agent.get_next_waypoint() is not None:
-                self.screen.blit(self.font.render(agent.get_next_waypoint(), True, agent_color, self.bg_color), (agent_pos[0] + 10, agent_pos[1] + 10))
-            if state['destination'] is not None:
-                self.pygame.draw.circle(self.screen, agent_color, (state['destination'][0] * self.env.block_size, state['destination'][1] * self.env.block_size), 6)
-                self.pygame.draw.circle(self.screen, agent_color, (state['destination'][0] * self.env.block_size, state['destination'][1] * self.env.block_size), 15, 2)
-
-        # * Overlays
-        text_y = 10
-        for text in self.env.status_text.split('\n'):
-            self.screen.blit(self.font.render(text, True, self.colors['red'], self.bg_color), (100, text_y))
-            text_y += 20
-
-        # Flip buffers
-        self.pygame.display.flip()
+        """Draw the environment; see renderer.Renderer."""
+        self.renderer.render()
 
     def pause(self):
         abs_pause_time = time.time()
         pause_text = "[PAUSED] Press any key to continue..."
         self.screen.blit(self.font.render(pause_text, True, self.colors['cyan'], self.bg_color), (100, self.height - 40))
         self.pygame.display.flip()
-        print pause_text  # [debug]
+        log.info(pause_text)
         while self.paused:
             for event in self.pygame.event.get():
                 if event.type == self.pygame.KEYDOWN:
                     self.paused = False
             self.pygame.time.wait(self.frame_delay)
-        self.screen.blit(self.font.render(pause_text, True, self.bg_color, self.bg_color), (100, self.height - 40))
+        self.renderer.invalidate()  # clears the pause text on the next frame
         self.start_time += (time.time() - abs_pause_time)
@@ -0,0 +1,191 @@
+"""Offline Q-table for the smartcab, by value iteration over the 512 sensed states.
+
+Rewards follow directly from the environment's rules (see rules.py). What the next state looks like is
+estimated from traffic statistics gathered with a probe agent that drives at random among
+DummyAgents, factored as independent pieces:
+
+* the other agents at the next intersection (left, right, oncoming) are drawn from their observed
+  joint distribution;
+* the next light depends on the current one and on whether the cab moved;
+* the next waypoint depends on the current one, the action and whether the cab moved.
+
+The arrival bonus is left out, since the sensed state says nothing about the distance to go.
+estimate() gathers the statistics (a short simulated run); solve() then takes milliseconds, and its
+QTable drops straight into LearningAgent.q_table, as a warm start or as a reference to score
+learners against (see score()).
+
+Example: python solver.py --trials 100
+"""
+
+import time
+import random
+import logging
+import argparse
+
+import numpy as np
+
+from environment import Agent, Environment
+from planner import RoutePlanner
+from qtable import QTable
+from rules import get_rules
+
+
+def decode_states():
+    """Arrays of (light, left, right, oncoming, next waypoint) codes, one entry per state index (see QTable.encode)."""
+    return [codes.ravel() for codes in np.indices((2, 4, 4, 4, 4))]
+
+
+def rewards_and_moves(rules=None):
+    """(reward, moved): arrays over [state, action] of the reward Environment.act() gives under rules (a rules.RuleSet
+    or a name, by default the default rules) and whether the cab moves."""
+    outcomes = get_rules(rules).outcomes
+    reward = np.zeros((QTable.n_states, QTable.n_actions))
+    moved = np.zeros((QTable.n_states, QTable.n_actions), dtype=bool)
+    for state, (light, left, _, oncoming, waypoint) in enumerate(zip(*[codes.tolist() for codes in decode_states()])):
+        for code, action in enumerate(QTable.actions):
+            turn, reward[state, code] = outcomes[(QTable.lights[light], QTable.actions[oncoming], QTable.actions[left], action,
+                                                  action is not None and code == waypoint)]
+            moved[state, code] = turn is not None
+    return reward, moved
+
+
+class TrafficModel(object):
+    """Next-state statistics for the solver.
+
+    traffic[t]: probability of the other agents' inputs t = left * 16 + right * 4 + oncoming;
+    light[l, moved, l']: probability of the next light; waypoint[w, a, moved, w']: probability of
+    the next waypoint.
+    """
+
+    def __init__(self, traffic, light, waypoint):
+        self.traffic = traffic
+        self.light = light
+        self.waypoint = waypoint
+
+    @classmethod
+    def from_counts(cls, traffic, light, waypoint):
+        """Normalize counts; rows without observations fall back to a uniform light and an unchanged waypoint."""
+        def normalize(counts, default):
+            totals = counts.sum(axis=-1, keepdims=True)
+            return np.where(totals > 0, counts / np.maximum(totals, 1), default)
+        return cls(normalize(traffic, 1.0 / len(traffic)), normalize(light, 0.5),
+                   normalize(waypoint, np.eye(4)[:, None, None, :]))
+
+
+class ProbeAgent(Agent):
+    """Drives at random, following the route planner's waypoints only by chance, and records what it senses."""
+
+    def __init__(self, env, seed=None):
+        super(ProbeAgent, self).__init__(env)
+        self.random = random.Random(seed)
+        self.planner = RoutePlanner(self.env, self)
+        self.transitions = []  # (state, action code, moved, next state)
+        self.last = None
+
+    def reset(self, destination=None):
+        self.planner.route_to(destination)
+        self.last = None  # no transition across trials
+
+    def update(self, t):
+        self.next_waypoint = self.planner.next_waypoint()
+        state = QTable.encode(self.env.sense(self), self.next_waypoint)
+        if self.last is not None:
+            self.transitions.append(self.last + (state,))
+        action = self.random.choice(Environment.valid_actions)
+        agent_state = self.env.agent_states[self]  # a live view of the agent's entries
+        before = agent_state['location'], agent_state['heading']
+        self.env.act(self, action)
+        moved = (agent_state['location'], agent_state['heading']) != before  # whatever the rules' rewards are
+        self.last = (state, QTable.action_index[action], moved)
+
+
+def estimate(n_steps=20000, num_dummies=12, seed=None, rules=None):
+    """Gather traffic statistics over n_steps of a probe agent among num_dummies DummyAgents, under rules."""
+    env = Environment(num_dummies=num_dummies, seed=seed, rules=rules)
+    probe = env.create_agent(ProbeAgent, seed=env.seeds.getrandbits(32))
+    env.set_primary_agent(probe, enforce_deadline=True)
+    steps = 0
+    while steps < n_steps:
+        env.reset()
+        while not env.done and steps < n_steps:
+            env.step()
+            steps += 1
+
+    states, actions, moved, next_states = [np.array(column, dtype=int) for column in zip(*probe.transitions)]
+    light, _, _, _, waypoint = [codes[states] for codes in decode_states()]
+    next_light, next_left, next_right, next_oncoming, next_waypoint = [codes[next_states] for codes in decode_states()]
+    traffic = np.bincount(next_left * 16 + next_right * 4 + next_oncoming, minlength=64).astype(float)
+    light_counts = np.zeros((2, 2, 2))
+    np.add.at(light_counts, (light, moved, next_light), 1)
+    waypoint_counts = np.zeros((4, 4, 2, 4))
+    np.add.at(waypoint_counts, (waypoint, actions, moved, next_waypoint), 1)
+    return TrafficModel.from_counts(traffic, light_counts, waypoint_counts)
+
+
+def solve(model, gamma=0.05, tolerance=1e-9, max_iterations=1000, rules=None):
+    """Value iteration: return the optimal QTable under model and rules, for LearningAgent's discount gamma."""
+    reward, moved = rewards_and_moves(rules)
+    light, _, _, _, waypoint = decode_states()
+    moved = moved.astype(int)
+    actions = np.arange(QTable.n_actions)[None, :]
+    values = reward.copy()
+    for _ in xrange(max_iterations):
+        best = values.max(axis=1).reshape(2, 64, 4)  # [light, traffic, waypoint]
+        expected = np.einsum('t,ltw->lw', model.traffic, best)  # over the other agents' inputs
+        # [light, waypoint, action, moved]: expected value of the next state
+        outlook = np.einsum('lmx,wamy,xy->lwam', model.light, model.waypoint, expected)
+        new_values = reward + gamma * outlook[light[:, None], waypoint[:, None], actions, moved]
+        change = np.abs(new_values - values).max()
+        values = new_values
+        if change < tolerance:
+            break
+    table = QTable(values=values)
+    table.visited[:] = True
+    return table
+
+
+def score(table, reference, states=None):
+    """Fraction of states (default: those visited in table) where table's greedy action is optimal under reference."""
+    states = np.flatnonzero(table.visited) if states is None else np.asarray(states)
+    if not len(states):
+        return 0.0
+    optimal = reference.values[states]
+    chosen = table.values[states].argmax(axis=1)
+    return np.mean(optimal[np.arange(len(states)), chosen] == optimal.max(axis=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=20000, help="probe steps for the traffic statistics")
+    parser.add_argument('--gamma', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trials', type=int, default=0, help="also compare cold and warm-started LearningAgents over this many trials")
+    parser.add_argument('--checkpoint', help="save the solved Q-table to this file (see checkpoint.py)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    start_time = time.time()
+    model = estimate(args.steps, seed=args.seed)
+    estimated = time.time()
+    table = solve(model, gamma=args.gamma)
+    print "traffic statistics: {:.2f} s, value iteration: {:.1f} ms".format(estimated - start_time, (time.time() - estimated) * 1e3)
+    if args.checkpoint:
+        import checkpoint
+        checkpoint.save_table(table, args.checkpoint)
+
+    if args.trials:
+        from agent import LearningAgent
+        from simulator import Simulator
+        for name, warm in [('cold start', False), ('warm start', True)]:
+            env = Environment(seed=args.seed + 1)
+            agent = env.create_agent(LearningAgent, gamma=args.gamma, seed=args.seed + 1)
+            if warm:
+                agent.q_table = QTable(values=table.values.copy())
+            env.set_primary_agent(agent, enforce_deadline=True)
+            Simulator(env, update_delay=0.0, display=False).run(n_trials=args.trials)
+            print "{}: {} successful trips, {} wrong moves, score against the solved table {:.3f}".format(
+                name, agent.successful_trips, agent.wrong_moves, score(agent.q_table, table, np.flatnonzero(agent.q_table.visited)))
+
+
+if __name__ == '__main__':
+    main()
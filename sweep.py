@@ -0,0 +1,99 @@
+"""Hyperparameter sweep for LearningAgent over alpha, gamma and epsilon schedules and seeds.
+
+Each combination runs in its own worker process, and the usual metrics are gathered into one table.
+With --stop-after K, a run stops as soon as its last K trips all succeeded (see convergence.py), so
+runs that learn quickly give their remaining trials back.
+Example: python sweep.py --alpha 0.5 log --gamma 0.05 0.2 --epsilon cutoff 0.05 --seeds 0 1 2
+"""
+
+import csv
+import random
+import logging
+import argparse
+import itertools
+import multiprocessing
+
+from agent import LearningAgent
+from convergence import NoRecentFailures
+from environment import Environment
+from simulator import Simulator
+
+columns = ['alpha', 'gamma', 'epsilon', 'seed', 'n_trials', 'stop_after', 'successful_trips', 'wrong_moves', 'cumulative_reward', 'mean_deadline_remaining',
+           'trials_run', 'steps_run', 'steps_saved']
+
+
+def run_one(params):
+    """Train a fresh LearningAgent with the given parameters and return its metrics."""
+    random.seed(params['seed'])  # seeds the environment's, agent's and planner's own streams
+
+    e = Environment()
+    a = e.create_agent(LearningAgent, alpha=params['alpha'], gamma=params['gamma'], epsilon=params['epsilon'])
+    e.set_primary_agent(a, enforce_deadline=True)
+    sim = Simulator(e, update_delay=0.0, display=False)
+    sim.run(n_trials=params['n_trials'], monitor=NoRecentFailures(params['stop_after']) if params.get('stop_after') else None)
+
+    result = dict(params)
+    result['successful_trips'] = a.successful_trips
+    result['wrong_moves'] = a.wrong_moves
+    result['cumulative_reward'] = a.cumulative_reward
+    result['mean_deadline_remaining'] = a.trip_stats.summary()['mean_deadline_remaining']  # None if no trip finished
+    result['trials_run'] = sim.trials_run
+    result['steps_run'] = sim.steps_run
+    result['steps_saved'] = sim.steps_saved
+    return result
+
+
+def sweep(alphas, gammas, epsilons, seeds, n_trials=100, processes=None, stop_after=None):
+    """Run every combination of the given parameters in a process pool; return one result dict per run.
+
+    With stop_after, each run stops early once its last stop_after trips all succeeded.
+    """
+    grid = [{'alpha': alpha, 'gamma': gamma, 'epsilon': epsilon, 'seed': seed, 'n_trials': n_trials, 'stop_after': stop_after}
+            for alpha, gamma, epsilon, seed in itertools.product(alphas, gammas, epsilons, seeds)]
+    pool = multiprocessing.Pool(processes, initializer=logging.disable, initargs=(logging.INFO,))  # quiet workers
+    try:
+        return pool.map(run_one, grid, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def format_table(results):
+    rows = [columns] + [[str(result[column]) for column in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in xrange(len(columns))]
+    return '\n'.join('  '.join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def schedule(value):
+    """Parse a command-line schedule: a number for a constant value, otherwise a schedule name."""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alpha', type=schedule, nargs='+', default=[0.5], help="constants or names from agent.alpha_schedules")
+    parser.add_argument('--gamma', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--epsilon', type=schedule, nargs='+', default=['cutoff'], help="constants or names from agent.epsilon_schedules")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--trials', type=int, default=100, help="trials per run")
+    parser.add_argument('--stop-after', type=int, default=None, help="stop a run once its last STOP_AFTER trips all succeeded")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--csv', help="also write the results table to this CSV file")
+    args = parser.parse_args()
+
+    results = sweep(args.alpha, args.gamma, args.epsilon, args.seeds, n_trials=args.trials, processes=args.processes, stop_after=args.stop_after)
+    print format_table(results)
+    print "steps run: {}, steps saved by stopping early: about {}".format(
+        sum(result['steps_run'] for result in results), sum(result['steps_saved'] for result in results))
+    if args.csv:
+        with open(args.csv, 'wb') as f:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()
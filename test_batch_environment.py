@@ -0,0 +1,114 @@
+"""Parity of BatchEnvironment with the scalar Environment under fixed seeds.
+
+Each scalar Environment is copied into a world of a BatchEnvironment with load_environment() at the
+start of every trial. Both are then stepped together: the batch primary agent replays the scalar
+primary agent's actions, and the batch dummies take the waypoints the DummyAgents drew. Run with
+python -m unittest discover.
+"""
+
+import random
+import logging
+import unittest
+
+import numpy as np
+
+from batch_environment import BatchEnvironment
+from environment import Agent, Environment
+from planner import RoutePlanner
+from rules import RuleSet
+
+
+class MostlyOnRouteAgent(Agent):
+    """Follows the planner's waypoint most of the time and otherwise acts at random, so trials end both ways."""
+
+    def __init__(self, env, seed):
+        super(MostlyOnRouteAgent, self).__init__(env)
+        self.planner = RoutePlanner(env, self, seed=seed)
+        self.random = random.Random(seed)
+        self.action = None
+        self.reward = None
+
+    def reset(self, destination=None):
+        self.planner.route_to(destination)
+
+    def update(self, t):
+        self.next_waypoint = self.planner.next_waypoint()
+        self.env.sense(self)
+        self.action = self.next_waypoint if self.random.random() < 0.7 else self.random.choice(Environment.valid_actions)
+        self.reward = self.env.act(self, self.action)
+
+
+class ReplayedDraws(object):
+    """Stands in for BatchEnvironment.random during a step, handing out the waypoint codes the DummyAgents drew."""
+
+    def __init__(self, codes):
+        self.codes = iter(codes)
+
+    def randint(self, low, high, size):
+        return np.array([next(self.codes) for _ in xrange(size)], dtype=int)
+
+
+class BatchEnvironmentParityTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def step_scalar(self, env):
+        """Step env and return the waypoint codes DummyAgents drew, in order."""
+        draws = []
+        choice = env.random.choice
+
+        def recording_choice(seq):
+            value = choice(seq)
+            if seq == Environment.valid_actions[1:]:
+                draws.append(Environment.valid_actions.index(value))
+            return value
+        env.random.choice = recording_choice
+        try:
+            env.step()
+        finally:
+            del env.random.choice
+        return draws
+
+    def assert_same_state(self, batch, env, reward, batch_reward, where):
+        agents = list(env.agent_states)
+        for slot, agent in enumerate(agents):
+            state = env.agent_states[agent]
+            self.assertEqual((batch.x[0, slot], batch.y[0, slot]), state['location'], where)
+            self.assertEqual(Environment.valid_headings[batch.heading[0, slot]], state['heading'], where)
+        self.assertEqual(batch_reward, reward, where)
+        self.assertEqual(batch.deadline[0], env.agent_states[env.primary_agent]['deadline'], where)
+        self.assertEqual(bool(batch.done[0]), env.done, where)
+        self.assertEqual(batch.t[0], env.t, where)
+        for cell, (x, y) in enumerate(env.locations):
+            self.assertEqual(batch.light_state[0, x - 1, y - 1], env.light_state(cell), where)
+
+    def test_steps_match_scalar_environment(self):
+        # the default rules, and rules with other rewards and no right turns on red
+        rule_sets = [None, RuleSet(on_route_reward=1.5, off_route_reward=-0.25, idle_reward=-0.1, violation_reward=-3.0,
+                                   arrival_bonus=7, right_on_red=False)]
+        endings = {'arrival': 0, 'deadline': 0}
+        for seed in xrange(12):
+            rules = rule_sets[seed // 2 % 2]
+            env = Environment(num_dummies=25 if seed % 2 else 12, seed=seed, rules=rules)
+            primary = env.create_agent(MostlyOnRouteAgent, seed=seed)
+            env.set_primary_agent(primary, enforce_deadline=seed % 3 != 0)
+            batch = BatchEnvironment(1, num_dummies=env.num_dummies, enforce_deadline=env.enforce_deadline, rules=rules)
+            for trial in xrange(4):
+                env.reset()
+                batch.load_environment(0, env)
+                reward = None
+                while not env.done:
+                    batch.random = ReplayedDraws(self.step_scalar(env))
+                    batch_reward = batch.step(lambda inputs, waypoint, deadline: np.array([Environment.valid_actions.index(primary.action)]))[0]
+                    self.assert_same_state(batch, env, primary.reward, batch_reward, "seed {}, trial {}, t {}".format(seed, trial, env.t))
+                    reward = primary.reward
+                endings['arrival' if env.agent_states[primary]['location'] == env.agent_states[primary]['destination'] else 'deadline'] += 1
+        self.assertTrue(endings['arrival'] > 0 and endings['deadline'] > 0, endings)
+
+
+if __name__ == '__main__':
+    unittest.main()
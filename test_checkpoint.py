@@ -0,0 +1,64 @@
+"""Saving and restoring a LearningAgent with checkpoint.py."""
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+import numpy as np
+
+import checkpoint
+from agent import LearningAgent
+from environment import Environment
+from simulator import Simulator
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'qtable.bin')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.directory)
+
+    def trained_agent(self, seed, n_trials):
+        env = Environment(seed=seed)
+        agent = env.create_agent(LearningAgent, seed=seed)
+        env.set_primary_agent(agent, enforce_deadline=True)
+        Simulator(env, update_delay=0.0, display=False).run(n_trials=n_trials)
+        return agent
+
+    def test_restore(self):
+        agent = self.trained_agent(0, 15)
+        checkpoint.save(agent, self.path)
+        restored = Environment(seed=1).create_agent(LearningAgent, seed=1)
+        checkpoint.restore(restored, self.path)
+
+        np.testing.assert_array_equal(restored.q_table.values, agent.q_table.values)
+        np.testing.assert_array_equal(restored.q_table.visited, agent.q_table.visited)
+        for name in checkpoint.counters:
+            self.assertEqual(getattr(restored, name), getattr(agent, name), name)
+        stats, restored_stats = agent.trip_stats, restored.trip_stats
+        self.assertEqual(restored_stats.summary(), stats.summary())
+        self.assertEqual(list(restored_stats._recent), list(stats._recent))
+        self.assertEqual(restored_stats._m2, stats._m2)
+
+        for deadline_remaining in [0, 0.5, 0.25]:  # the restored statistics keep running
+            stats.add(deadline_remaining)
+            restored_stats.add(deadline_remaining)
+        self.assertEqual(restored_stats.summary(), stats.summary())
+
+    def test_restore_memory_map_into_learning_agent(self):
+        checkpoint.save(self.trained_agent(0, 1), self.path)
+        agent = Environment(seed=1).create_agent(LearningAgent, seed=1)
+        self.assertRaises(ValueError, checkpoint.restore, agent, self.path, mmap=True)
+        table, _ = checkpoint.load(self.path, mmap=True)  # still fine for read-only use
+        self.assertFalse(table.values.flags.writeable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Early stopping in Simulator.run() with the monitors of convergence.py."""
+
+import logging
+import unittest
+
+import numpy as np
+
+from agent import LearningAgent
+from convergence import NoRecentFailures, QTableDelta
+from environment import Agent, Environment
+from simulator import Simulator
+
+
+class StopAfter(object):
+    """Converged after the given number of trials."""
+
+    def __init__(self, trials):
+        self.trials = trials
+        self.calls = 0
+
+    def converged(self, env):
+        self.calls += 1
+        return self.calls >= self.trials
+
+
+def make_simulator(seed=0, agent_class=LearningAgent):
+    env = Environment(seed=seed)
+    agent = env.create_agent(agent_class, seed=seed) if agent_class is LearningAgent else env.create_agent(agent_class)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    return Simulator(env, update_delay=0.0, display=False), agent
+
+
+class SimulatorMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_early_stop(self):
+        sim, _ = make_simulator()
+        sim.run(n_trials=20, monitor=StopAfter(5))
+        steps = [trial['steps'] for trial in sim.trial_stats]
+        self.assertTrue(sim.converged)
+        self.assertEqual(sim.trials_run, 5)
+        self.assertEqual(sim.steps_run, sum(steps))
+        self.assertEqual(sim.steps_saved, int(round(15 * sum(steps) / 5.0)))
+
+    def test_no_recent_failures(self):
+        sim, agent = make_simulator()
+        sim.run(n_trials=100, monitor=NoRecentFailures(5))
+        self.assertTrue(sim.converged and sim.trials_run < 100)
+        self.assertEqual(agent.trip_stats.count, sim.trials_run)
+        self.assertFalse(any(list(agent.trip_stats._recent)[-5:]))  # whether each of the last trips failed
+
+    def test_without_monitor_unchanged(self):
+        sim, agent = make_simulator()
+        sim.run(n_trials=15)
+        monitored_sim, monitored_agent = make_simulator()
+        monitored_sim.run(n_trials=15, monitor=StopAfter(100))  # never converges within the run
+        for run in (sim, monitored_sim):
+            self.assertFalse(run.converged)
+            self.assertEqual((run.trials_run, run.steps_saved), (15, 0))
+        self.assertEqual(sim.steps_run, monitored_sim.steps_run)
+        np.testing.assert_array_equal(agent.q_table.values, monitored_agent.q_table.values)
+
+    def test_monitor_needs_learning_agent(self):
+        for monitor in (NoRecentFailures(5), QTableDelta()):
+            sim, _ = make_simulator(agent_class=Agent)
+            self.assertRaises(TypeError, sim.run, n_trials=3, monitor=monitor)
+
+
+if __name__ == '__main__':
+    unittest.main()
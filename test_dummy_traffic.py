@@ -0,0 +1,84 @@
+"""DummyTraffic's vectorized step against a direct, agent by agent, reading of its rules under each rule set."""
+
+import random
+import logging
+import unittest
+
+from environment import Agent, Environment
+from planner import RoutePlanner
+from rules import rule_sets
+
+
+class RandomAgent(Agent):
+    """Primary agent that acts at random, so the dummies see it doing anything."""
+
+    def __init__(self, env, seed):
+        super(RandomAgent, self).__init__(env)
+        self.planner = RoutePlanner(env, self, seed=seed)
+        self.random = random.Random(seed)
+
+    def reset(self, destination=None):
+        self.planner.route_to(destination)
+
+    def update(self, t):
+        self.next_waypoint = self.planner.next_waypoint()
+        self.env.act(self, self.random.choice(Environment.valid_actions))
+
+
+def sensed(env, h, others):
+    """(oncoming, left) that Environment.sense() reports for heading h among others, (heading, waypoint) pairs in order."""
+    oncoming = left = None
+    for other_heading, waypoint in others:
+        relative = Environment.relative_heading[h][other_heading]
+        if relative == 'oncoming' and oncoming != 'left':
+            oncoming = waypoint
+        elif relative == 'left' and left != 'forward':
+            left = waypoint
+    return oncoming, left
+
+
+def expected_moves(env):
+    """Location and heading of every dummy after the next step, with all dummies sensing the current state."""
+    traffic, agents = env.dummy_traffic, env.agents
+    everyone = [((traffic.x[k], traffic.y[k]), traffic.heading[k], Environment.valid_actions[traffic.waypoint[k]]) for k in xrange(traffic.n)]
+    everyone += [((agents.x[i], agents.y[i]), agents.heading[i], agents.agents[i].get_next_waypoint()) for i in xrange(len(agents.agents))]
+    moves = []
+    for k in xrange(traffic.n):
+        location, h, waypoint = everyone[k]
+        oncoming, left = sensed(env, h, [(other_h, other_waypoint) for j, (other_location, other_h, other_waypoint) in enumerate(everyone)
+                                         if other_location == location and j != k])
+        light = 'green' if env.light_state(env.cell(*location)) == (h % 2 == 1) else 'red'
+        if env.rules.legal(light, oncoming, left, waypoint):
+            h = (h + {'forward': 0, 'left': 1, 'right': 3}[waypoint]) % 4
+            dx, dy = Environment.valid_headings[h]
+            location = ((location[0] + dx - 1) % env.grid_size[0] + 1, (location[1] + dy - 1) % env.grid_size[1] + 1)
+        moves.append((location, h))
+    return moves
+
+
+class DummyTrafficTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_moves_follow_each_rule_set(self):
+        for name, rules in sorted(rule_sets.iteritems()):
+            for seed, (num_dummies, grid_size) in enumerate([(5, (8, 6)), (50, (4, 3)), (300, (8, 6))]):
+                env = Environment(num_dummies=num_dummies, grid_size=grid_size, vectorized_dummies=True, seed=seed, rules=rules)
+                env.set_primary_agent(env.create_agent(RandomAgent, seed=seed), enforce_deadline=False)
+                traffic = env.dummy_traffic
+                for trial in xrange(2):
+                    env.reset()
+                    for _ in xrange(20):
+                        env.light_time = env.t  # the lights as step() will see them
+                        expected = expected_moves(env)
+                        env.step()
+                        self.assertEqual([((traffic.x[k], traffic.y[k]), traffic.heading[k]) for k in xrange(traffic.n)], expected,
+                                         "{}, seed {}, trial {}, t {}".format(name, seed, trial, env.t))
+
+
+if __name__ == '__main__':
+    unittest.main()
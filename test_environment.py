@@ -0,0 +1,34 @@
+"""Environment's lazily computed traffic lights."""
+
+import logging
+import unittest
+
+from environment import Environment
+
+
+class TrafficLightTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_state_switches_every_period(self):
+        env = Environment(num_dummies=5, seed=0)
+        lights = [env.intersections[location] for location in env.locations]
+        states = [light.state for light in lights]
+        for trial in xrange(3):
+            env.reset()  # lights carry over into the next trial
+            for step in xrange(15):
+                light_time = env.light_time
+                env.step()
+                for cell, light in enumerate(lights):
+                    switched = env.light_time != light_time and env.light_time % light.period == 0
+                    self.assertEqual(light.state, states[cell] != switched, (trial, step, cell))
+                    self.assertEqual(light.state, env.light_state(cell))
+                    states[cell] = light.state
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+"""ReplayMemory under every eviction and sampling policy, past its capacity."""
+
+import unittest
+
+import numpy as np
+
+from experience import ReplayMemory, eviction_policies, sampling_policies
+
+
+class ReplayMemoryTest(unittest.TestCase):
+
+    def test_policies_past_capacity(self):
+        for eviction in sorted(eviction_policies):
+            for sampling in sorted(sampling_policies):
+                memory = ReplayMemory(capacity=100, eviction=eviction, sampling=sampling, recent=10, seed=0)
+                for i in xrange(20000):
+                    memory.add(i % 512, i % 4, 1.0, (i + 1) % 512, (i + 1) % 4)
+                    states = memory.sample(8)[0]
+                    self.assertEqual(len(states), 8, (eviction, sampling, i))
+                    held = memory.state[:memory.size]
+                    self.assertTrue(np.in1d(states, held).all(), (eviction, sampling, i))
+                self.assertEqual(len(memory), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""RoutePlanner's waypoint lookup table against the branch logic of compute_waypoint()."""
+
+import unittest
+
+from environment import Agent, Environment
+from planner import RoutePlanner, compute_waypoint
+
+
+class WaypointLookupTest(unittest.TestCase):
+
+    def check_grid(self, grid_size):
+        env = Environment(num_dummies=0, grid_size=grid_size, seed=0)
+        agent = env.create_agent(Agent)
+        planner = RoutePlanner(env, agent, use_lookup=True, seed=0)
+        i = env.agent_states[agent].index
+        for location in env.locations:
+            env.agents.x[i], env.agents.y[i] = location
+            for h, heading in enumerate(Environment.valid_headings):
+                env.agents.heading[i] = h
+                for destination in env.locations:  # includes location itself
+                    planner.destination = destination
+                    self.assertEqual(planner.next_waypoint(), compute_waypoint(location, heading, destination),
+                                     "location {}, heading {}, destination {}".format(location, heading, destination))
+
+    def test_default_grid(self):
+        self.check_grid((8, 6))
+
+    def test_non_square_grid(self):
+        self.check_grid((3, 11))
+
+
+if __name__ == '__main__':
+    unittest.main()
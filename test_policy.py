@@ -0,0 +1,40 @@
+"""Policy's answers to request lines, including ones it cannot answer."""
+
+import json
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+from policy import Policy, serve_lines
+from qtable import QTable
+
+
+class ServeLinesTest(unittest.TestCase):
+
+    def setUp(self):
+        values = np.zeros((QTable.n_states, QTable.n_actions))
+        values[:, QTable.action_index['forward']] = 1.0
+        self.policy = Policy(values, seed=0)
+
+    def serve(self, lines):
+        outfile = StringIO()
+        serve_lines(self.policy, StringIO(''.join(line + '\n' for line in lines)), outfile)
+        return [json.loads(reply) for reply in outfile.getvalue().splitlines()]
+
+    def test_queries(self):
+        inputs = {'light': 'green', 'oncoming': None, 'left': 'right', 'right': None, 'next': 'left'}
+        self.assertEqual(self.serve([json.dumps([inputs, 0, QTable.n_states - 1])]), [['forward'] * 3])
+
+    def test_bad_requests_keep_serving(self):
+        inputs = {'light': 'green', 'oncoming': None, 'left': None, 'right': None}
+        bad = ['{"light": ', json.dumps([dict(inputs, light='amber', next=None)]), json.dumps([inputs]),
+               json.dumps([QTable.n_states]), json.dumps([-1]), json.dumps(['forward']), json.dumps({'next': None})]
+        replies = self.serve(bad + [json.dumps([7])])
+        for line, reply in zip(bad, replies):
+            self.assertIn('error', reply, line)
+        self.assertEqual(replies[-1], ['forward'])
+
+
+if __name__ == '__main__':
+    unittest.main()
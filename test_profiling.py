@@ -0,0 +1,35 @@
+"""PhaseProfiler's accounting of Environment.step() phases."""
+
+import logging
+import unittest
+
+from agent import LearningAgent
+from environment import Environment
+from profiling import PhaseProfiler
+from simulator import Simulator
+
+
+class PhaseProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_every_step_counts_every_phase(self):
+        env = Environment(seed=0)
+        env.set_primary_agent(env.create_agent(LearningAgent, seed=0), enforce_deadline=True)
+        profiler = PhaseProfiler()
+        env.enable_profiling(profiler)
+        sim = Simulator(env, update_delay=0.0, display=False)
+        sim.run(n_trials=10)
+        self.assertEqual(len(profiler.trials), 10)
+        self.assertEqual(sum(summary['environment.deadline']['calls'] for summary in profiler.trials), sim.steps_run)
+        for trial, summary in enumerate(profiler.trials):
+            for phase in ('environment.lights', 'environment.update.LearningAgent'):
+                self.assertEqual(summary[phase]['calls'], summary['environment.deadline']['calls'], (trial, phase))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+"""QTable's batched update against the per-transition update rule."""
+
+import unittest
+
+import numpy as np
+
+from qtable import QTable
+
+
+class UpdateBatchTest(unittest.TestCase):
+
+    def test_repeated_pairs_apply_in_order(self):
+        rng = np.random.RandomState(0)
+        for _ in xrange(20):
+            table = QTable(values=rng.randn(QTable.n_states, QTable.n_actions))
+            expected = table.values.copy()
+            n = 40
+            states, actions = rng.randint(0, 5, n), rng.randint(0, QTable.n_actions, n)  # few states, so pairs repeat
+            rewards = rng.randn(n)
+            next_states, next_actions = rng.randint(0, QTable.n_states, n), rng.randint(0, QTable.n_actions, n)
+            targets = rewards + 0.3 * expected[next_states, next_actions]  # from the values before the batch
+            for i in xrange(n):
+                expected[states[i], actions[i]] = 0.6 * expected[states[i], actions[i]] + 0.4 * targets[i]
+            table.update_batch(states, actions, rewards, next_states, next_actions, alpha=0.4, gamma=0.3)
+            np.testing.assert_allclose(table.values, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""The compiled traffic rules against the if/elif rules Environment.act() used to apply."""
+
+import itertools
+import unittest
+
+from rules import RuleSet, actions, lights
+
+
+def branch_outcome(light, oncoming, left, action, on_route):
+    """(turn, reward) as the original act() settled a move, heading changes as in rules.turns."""
+    turn = 0
+    move_okay = True
+    if action == 'forward':
+        if light != 'green':
+            move_okay = False
+    elif action == 'left':
+        if light == 'green' and (oncoming == None or oncoming == 'left'):
+            turn = 1
+        else:
+            move_okay = False
+    elif action == 'right':
+        if light == 'green' or left != 'forward':
+            turn = 3
+        else:
+            move_okay = False
+
+    if move_okay:
+        if action is not None:
+            return turn, 2.0 if on_route else -0.5
+        return None, 0.0
+    return None, -1.0
+
+
+class RuleSetTest(unittest.TestCase):
+
+    def test_default_rules_match_branch_logic(self):
+        outcomes = RuleSet().outcomes
+        keys = list(itertools.product(lights, actions, actions, actions, [False, True]))
+        self.assertEqual(sorted(outcomes), sorted(keys))
+        for key in keys:
+            self.assertEqual(outcomes[key], branch_outcome(*key), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Simulator's bookkeeping when a run is interrupted with Ctrl+C."""
+
+import logging
+import unittest
+
+from agent import LearningAgent
+from environment import Environment
+from simulator import Simulator
+
+
+class InterruptedEnvironment(Environment):
+    """Raises KeyboardInterrupt on the given reset (counting from 1) or after the given number of steps in all."""
+
+    def __init__(self, interrupt_reset=None, interrupt_step=None, **kwargs):
+        super(InterruptedEnvironment, self).__init__(**kwargs)
+        self.interrupt_reset = interrupt_reset
+        self.interrupt_step = interrupt_step
+        self.resets = 0
+        self.steps = 0
+
+    def reset(self, seed=None):
+        self.resets += 1
+        if self.resets == self.interrupt_reset:
+            raise KeyboardInterrupt
+        super(InterruptedEnvironment, self).reset(seed)
+
+    def step(self):
+        if self.steps == self.interrupt_step:
+            raise KeyboardInterrupt
+        super(InterruptedEnvironment, self).step()
+        self.steps += 1
+
+
+class InterruptTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def run_interrupted(self, update_delay, **interrupt):
+        env = InterruptedEnvironment(seed=0, **interrupt)
+        env.set_primary_agent(env.create_agent(LearningAgent, seed=0), enforce_deadline=True)
+        sim = Simulator(env, update_delay=update_delay, display=False)
+        sim.run(n_trials=10)
+        self.assertTrue(sim.quit)
+        return sim, env
+
+    def test_interrupt_during_reset(self):
+        for update_delay in (0.0, 1e-6):  # headless and paced runs
+            for reset in (1, 3):
+                sim, env = self.run_interrupted(update_delay, interrupt_reset=reset)
+                self.assertEqual((sim.trials_run, sim.steps_run), (reset - 1, env.steps), (update_delay, reset))
+
+    def test_interrupt_during_step(self):
+        for update_delay in (0.0, 1e-6):
+            sim, env = self.run_interrupted(update_delay, interrupt_step=40)
+            self.assertEqual((sim.trials_run, sim.steps_run), (env.resets, 40), update_delay)
+
+
+if __name__ == '__main__':
+    unittest.main()
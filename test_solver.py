@@ -0,0 +1,35 @@
+"""solver.py's probe agent and reward tables under each rule set."""
+
+import logging
+import unittest
+
+from environment import Environment
+from rules import RuleSet, rule_sets
+from solver import ProbeAgent, rewards_and_moves
+
+
+class ProbeAgentTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_moves_follow_the_rules(self):
+        # the last rule set penalizes violations like off-route moves, so rewards cannot tell whether the cab moved
+        for name, rules in sorted(rule_sets.items()) + [('violation as off route', RuleSet(violation_reward=-0.5))]:
+            env = Environment(num_dummies=12, seed=0, rules=rules)
+            probe = env.create_agent(ProbeAgent, seed=0)
+            env.set_primary_agent(probe, enforce_deadline=True)
+            for _ in xrange(10):
+                env.reset()
+                while not env.done:
+                    env.step()
+            _, moved = rewards_and_moves(rules)
+            for state, action, probe_moved, _ in probe.transitions:
+                self.assertEqual(probe_moved, moved[state, action], (name, state, action))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+"""TripStats' running metrics."""
+
+import unittest
+
+from tripstats import TripStats
+
+
+class TripStatsTest(unittest.TestCase):
+
+    def test_no_trips(self):
+        summary = TripStats().summary()
+        self.assertEqual(summary['trips'], 0)
+        self.assertIsNone(summary['mean_deadline_remaining'])
+        self.assertIsNone(summary['variance_deadline_remaining'])
+
+    def test_running_metrics(self):
+        stats = TripStats(window=3)
+        for deadline_remaining in [0, 0.5, 0, 0.25, 0.75, 0.5]:
+            stats.add(deadline_remaining)
+        summary = stats.summary()
+        self.assertEqual((summary['trips'], summary['failures'], summary['last_failed_trip'], summary['recent_failures']), (6, 2, 3, 0))
+        self.assertAlmostEqual(summary['mean_deadline_remaining'], 2.0 / 6)
+        self.assertAlmostEqual(summary['variance_deadline_remaining'], sum((v - 2.0 / 6) ** 2 for v in [0, 0.5, 0, 0.25, 0.75, 0.5]) / 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
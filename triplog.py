@@ -0,0 +1,162 @@
+"""Streaming columnar log of every step and trip of a run, for offline analysis.
+
+TripLogWriter receives step records as a LearningAgent event sink and trip summaries as an
+Environment observer:
+
+    writer = TripLogWriter('run.log')
+    agent = env.create_agent(LearningAgent, event_sink=writer)
+    env.observers.append(writer)
+    ...
+    writer.close()
+
+Rows are buffered per column and appended to the file in chunks of chunk_size rows, so memory stays
+bounded however long the run. Each chunk stores its columns one after another as raw little-endian
+arrays (see step_columns and trip_columns), 8-byte aligned, so read_triplog() can memory-map the
+file and hand the columns to NumPy without parsing. The file is append-only: several runs can go
+to one log, and a run cut short only loses its last, unwritten chunk.
+"""
+
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from environment import Environment
+
+MAGIC = 'SCTL'
+VERSION = 1
+file_header = struct.Struct('<4sHH')  # magic, version, padding
+chunk_header = struct.Struct('<BxxxI')  # kind, rows
+
+STEPS, TRIPS = 0, 1
+# (name, array typecode for buffering, NumPy dtype on disk)
+step_columns = [('t', 'i', '<i4'), ('state', 'h', '<i2'), ('action', 'b', 'i1'), ('reward', 'f', '<f4'), ('deadline', 'i', '<i4')]
+trip_columns = [('trial', 'i', '<i4'), ('start_x', 'h', '<i2'), ('start_y', 'h', '<i2'), ('destination_x', 'h', '<i2'),
+                ('destination_y', 'h', '<i2'), ('success', 'B', 'u1'), ('deadline_remaining', 'f', '<f4'),
+                ('wrong_moves', 'i', '<i4'), ('steps', 'i', '<i4')]
+schemas = {STEPS: step_columns, TRIPS: trip_columns}
+
+
+def _padding(size):
+    return -size % 8
+
+
+class TripLogWriter(object):
+    """Appends step and trip rows to a columnar log file, one chunk at a time.
+
+    Actions are stored as codes indexing Environment.valid_actions. A trip's deadline remaining is
+    the fraction of its starting deadline left when it succeeded (0 for a failed trip), as
+    LearningAgent measures it.
+    """
+
+    def __init__(self, path, chunk_size=4096):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(file_header.pack(MAGIC, VERSION, 0))
+        self.buffers = {kind: [array(typecode) for _, typecode, _ in columns] for kind, columns in schemas.iteritems()}
+        self.trials = 0
+        self.trip = None  # row of the trip in progress
+
+    # LearningAgent event sink
+    def emit(self, record):
+        columns = self.buffers[STEPS]
+        columns[0].append(record['t'])
+        columns[1].append(record['state'])
+        columns[2].append(Environment.valid_actions.index(record['action']))
+        columns[3].append(record['reward'])
+        columns[4].append(record['deadline'])
+        if len(columns[0]) >= self.chunk_size:
+            self.write_chunk(STEPS)
+
+    # Environment observer
+    def trial_started(self, env):
+        self.end_trip()
+        state = env.agent_states[env.primary_agent]
+        start, destination = state['location'], state['destination']
+        self.trip = {'trial': self.trials, 'start_x': start[0], 'start_y': start[1], 'destination_x': destination[0], 'destination_y': destination[1],
+                     'success': False, 'deadline_start': state['deadline'], 'deadline': state['deadline'], 'wrong_moves': 0, 'steps': 0}
+        self.trials += 1
+
+    def primary_acted(self, env, action, reward):
+        trip = self.trip
+        trip['steps'] += 1
+        trip['deadline'] = env.get_deadline(env.primary_agent)
+        if reward >= 9.0:
+            trip['success'] = True
+        if reward < 0 or reward == 9.0 or reward == 9.5:  # as LearningAgent counts wrong moves
+            trip['wrong_moves'] += 1
+
+    def end_trip(self):
+        """Add the trip in progress (it is over once the next trial starts, or when the log is closed)."""
+        trip = self.trip
+        if trip is None:
+            return
+        trip['deadline_remaining'] = 1.0 * trip['deadline'] / trip['deadline_start'] if trip['success'] and trip['deadline_start'] else 0.0
+        for (name, _, _), column in zip(trip_columns, self.buffers[TRIPS]):
+            column.append(trip[name])
+        self.trip = None
+        if len(self.buffers[TRIPS][0]) >= self.chunk_size:
+            self.write_chunk(TRIPS)
+
+    def write_chunk(self, kind):
+        columns = self.buffers[kind]
+        rows = len(columns[0])
+        if not rows:
+            return
+        self.file.write(chunk_header.pack(kind, rows))
+        for (_, _, dtype), column in zip(schemas[kind], columns):
+            data = np.frombuffer(column, dtype=column.typecode).astype(dtype).tobytes()  # fixed width and byte order
+            self.file.write(data + '\0' * _padding(len(data)))
+        self.file.flush()
+        self.buffers[kind] = [array(column.typecode) for column in columns]
+
+    def flush(self):
+        for kind in schemas:
+            self.write_chunk(kind)
+
+    def close(self):
+        if not self.file.closed:
+            self.end_trip()
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_triplog(path):
+    """Return (steps, trips): dicts mapping column names to NumPy arrays over every chunk of a log.
+
+    The file is memory-mapped; columns that fit in one chunk are read-only views of the map.
+    """
+    if os.path.getsize(path) <= file_header.size:
+        data = np.zeros(0, dtype=np.uint8)
+    else:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(data) and file_header.unpack(data[:file_header.size].tobytes())[:2] != (MAGIC, VERSION):
+        raise ValueError("{} is not a version {} trip log".format(path, VERSION))
+
+    parts = {kind: [[] for _ in columns] for kind, columns in schemas.iteritems()}
+    offset = file_header.size
+    while offset + chunk_header.size <= len(data):
+        kind, rows = chunk_header.unpack(data[offset:offset + chunk_header.size].tobytes())
+        columns = schemas[kind]
+        size = sum(rows * np.dtype(dtype).itemsize + _padding(rows * np.dtype(dtype).itemsize) for _, _, dtype in columns)
+        if offset + chunk_header.size + size > len(data):
+            break  # a chunk cut short by an interrupted run
+        offset += chunk_header.size
+        for i, (_, _, dtype) in enumerate(columns):
+            nbytes = rows * np.dtype(dtype).itemsize
+            parts[kind][i].append(data[offset:offset + nbytes].view(dtype))
+            offset += nbytes + _padding(nbytes)
+
+    def assemble(kind):
+        return {name: (chunks[0] if len(chunks) == 1 else np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype))
+                for (name, _, dtype), chunks in zip(schemas[kind], parts[kind])}
+    return assemble(STEPS), assemble(TRIPS)
@@ -0,0 +1,50 @@
+from collections import deque
+
+
+class TripStats(object):
+    """Running statistics over finished trips, each updated in constant time.
+
+    A trip is recorded by its deadline remaining (the fraction of the starting deadline left when
+    it ended), where 0 means the trip failed.
+    """
+
+    def __init__(self, window=10):
+        self.window = window  # number of most recent trips covered by recent_failures()
+        self.count = 0
+        self.failures = 0
+        self.last_failed_trip = None  # 1-based number of the last failed trip
+        self.mean = 0.0  # running mean of deadline remaining
+        self._m2 = 0.0  # running sum of squared deviations from the mean (Welford's method)
+        self._recent = deque(maxlen=window)
+        self._recent_failures = 0
+
+    def add(self, deadline_remaining):
+        self.count += 1
+        failed = deadline_remaining == 0
+        if failed:
+            self.failures += 1
+            self.last_failed_trip = self.count
+
+        if len(self._recent) == self.window:
+            self._recent_failures -= self._recent[0]
+        self._recent.append(failed)
+        self._recent_failures += failed
+
+        delta = deadline_remaining - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (deadline_remaining - self.mean)
+
+    def recent_failures(self):
+        """Number of failed trips among the last window trips."""
+        return self._recent_failures
+
+    def variance(self):
+        """Population variance of deadline remaining (0.0 before any trip)."""
+        return self._m2 / self.count if self.count > 0 else 0.0
+
+    def summary(self):
+        """The metrics as a dict; the deadline remaining statistics are None until a trip has finished."""
+        finished = self.count > 0
+        return {'trips': self.count, 'failures': self.failures, 'last_failed_trip': self.last_failed_trip,
+                'recent_failures': self._recent_failures, 'mean_deadline_remaining': self.mean if finished else None,
+                'variance_deadline_remaining': self.variance() if finished else None}